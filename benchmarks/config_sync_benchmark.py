@@ -0,0 +1,108 @@
+"""
+Бенчмарк загрузки конфигурации при старте: прежний путь (open_by_key + worksheet() + get_all_records() для
+каждого из листов 'states', 'ru_buttons', 'users') против одного values:batchGet.
+Google Sheets подменяется клиентом, который отвечает данными из локальной БД с задержкой сети на каждый запрос.
+
+Запуск из корня репозитория (нужен DATABASE_PATH в .env или окружении):
+    python -m benchmarks.config_sync_benchmark [задержка одного запроса, мс]
+"""
+import json
+import sys
+import time
+from urllib.parse import unquote
+
+import gspread
+from gspread.urls import SPREADSHEET_URL
+
+from utils import google_sheets
+from utils.db_sync import fetch_config_from_google, _parse_states, _parse_buttons, _parse_users
+from utils.models import SessionLocal, State, Button, User
+
+SHEET_ID = "benchmark"
+
+
+def _sheets_from_db() -> dict:
+    with SessionLocal() as session:
+        states = session.query(State).all()
+        buttons = session.query(Button).all()
+        users = session.query(User).all()
+    state_columns = ["state_key", "comment", "phrase_admin", "phrase_manager", "phrase_user",
+                     "buttons_admin", "buttons_manager", "buttons_user"]
+    user_columns = ["user_id", "name", "role", "state", "last_message_id", "is_workday", "daily_report_draft",
+                    "location"]
+    return {
+        "states": [state_columns] + [[str(getattr(s, c) or "") for c in state_columns] for s in states],
+        "ru_buttons": [["key", "label"]] + [[b.key, b.label] for b in buttons],
+        "users": [user_columns] + [[
+            str(u.user_id), u.name or "", u.role or "", u.state or "", str(u.last_message_id or ""),
+            "TRUE" if u.is_workday else "FALSE", json.dumps(u.daily_report_draft or {}, ensure_ascii=False),
+            u.location or ""
+        ] for u in users],
+    }
+
+
+class _Response:
+    def __init__(self, body: dict):
+        self._body = body
+
+    def json(self) -> dict:
+        return self._body
+
+
+class FakeClient(gspread.Client):
+    """
+    Отвечает на запросы метаданных, values.get и values.batchGet, выжидая latency секунд на каждый.
+    """
+
+    def __init__(self, sheets: dict, latency: float):
+        super().__init__(auth=None)
+        self.sheets = sheets
+        self.latency = latency
+        self.requests = 0
+
+    def request(self, method, endpoint, params=None, **kwargs):
+        self.requests += 1
+        time.sleep(self.latency)
+        if endpoint == SPREADSHEET_URL % SHEET_ID:
+            return _Response({
+                "properties": {"title": "bot_config"},
+                "sheets": [{"properties": {"title": title, "sheetId": i, "index": i}}
+                           for i, title in enumerate(self.sheets)],
+            })
+        if endpoint.endswith("values:batchGet"):
+            return _Response({"valueRanges": [{"range": r, "values": self.sheets[r]} for r in params["ranges"]]})
+        title = unquote(endpoint.rsplit("/", 1)[1]).strip("'")
+        return _Response({"range": title, "majorDimension": "ROWS", "values": self.sheets[title]})
+
+
+def _legacy_fetch(client: gspread.Client):
+    spreadsheet = client.open_by_key(SHEET_ID)
+    return (
+        _parse_states(spreadsheet.worksheet("states").get_all_records()),
+        _parse_buttons(spreadsheet.worksheet("ru_buttons").get_all_records()),
+        _parse_users(spreadsheet.worksheet("users").get_all_records()),
+    )
+
+
+def main(latency_ms: float = 300) -> None:
+    client = FakeClient(_sheets_from_db(), latency_ms / 1000)
+
+    started = time.perf_counter()
+    legacy = _legacy_fetch(client)
+    legacy_time, legacy_requests = time.perf_counter() - started, client.requests
+
+    google_sheets._client = client
+    client.requests = 0
+    started = time.perf_counter()
+    batched = fetch_config_from_google(SHEET_ID)
+    batched_time, batched_requests = time.perf_counter() - started, client.requests
+
+    assert legacy == batched, "результаты разбора отличаются"
+    print(f"Задержка одного запроса: {latency_ms:.0f} мс; строк: "
+          f"{len(batched[0])} состояний, {len(batched[1])} кнопок, {len(batched[2])} пользователей")
+    print(f"до:    {legacy_time:6.2f} с, запросов к API: {legacy_requests}")
+    print(f"после: {batched_time:6.2f} с, запросов к API: {batched_requests}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,136 @@
+"""
+Микро-бенчмарк отрисовки экранов: старый путь (запрос State и Button в БД, json.loads, replace + str.format
+с полным словарём плейсхолдеров на каждый рендер) против скомпилированных шаблонов и кэша отрисовки.
+
+Запуск из корня репозитория (нужен DATABASE_PATH в .env или окружении):
+    python -m benchmarks.render_benchmark [количество повторов]
+
+Бенчмарк работает с временной копией БД: init_db может добавить в неё таблицы и колонки, рабочая БД не меняется.
+"""
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+from dotenv import load_dotenv
+
+
+def _use_database_copy() -> str:
+    """
+    Копирует БД из DATABASE_PATH во временный каталог (через backup API SQLite — вместе с журналом WAL)
+    и подменяет DATABASE_PATH до импорта config. Возвращает временный каталог.
+    """
+    load_dotenv()
+    db_file = os.environ["DATABASE_PATH"].replace("sqlite:///", "")
+    tmp_dir = tempfile.mkdtemp(prefix="render_benchmark_")
+    copy_file = os.path.join(tmp_dir, os.path.basename(db_file))
+    source, target = sqlite3.connect(db_file), sqlite3.connect(copy_file)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    os.environ["DATABASE_PATH"] = f"sqlite:///{copy_file}"
+    return tmp_dir
+
+
+_TMP_DIR = _use_database_copy()
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup  # noqa: E402
+
+from utils.models import SessionLocal, State, Button, User, engine, async_engine, init_db  # noqa: E402
+from utils.models.messages import BotMessage  # noqa: E402
+from utils.models.config_snapshot import build_snapshot_from_db, install_snapshot  # noqa: E402
+from utils.models.report_draft import load_draft  # noqa: E402
+from utils.models.templates import ROLES  # noqa: E402
+
+
+def _legacy_render(user: User, comment: str):
+    """
+    Копия прежнего BotMessage.__post_init__ — для сравнения.
+    """
+    session = SessionLocal()
+    try:
+        state = session.query(State).filter(State.state_key == user.state).first()
+        text = getattr(state, f"phrase_{user.role}") or ""
+        text = text.replace(r'\n', '\n')
+        draft = user.daily_report_draft
+        placeholders = {
+            "name": user.name or "",
+            "id": str(user.user_id),
+            "role": user.role,
+            "comment": comment or "",
+            "daily_report_date": draft["date"],
+            "wolt": draft["wolt"],
+            "bolt": draft["bolt"],
+            "yandex": draft["yandex"],
+            "daily_report_temp": draft["temp"],
+            "daily_report_weather_label": draft["weather_label"],
+        }
+        try:
+            text = text.format(**placeholders)
+        except KeyError:
+            pass
+
+        raw_buttons = getattr(state, f"buttons_{user.role}")
+        markup = None
+        if raw_buttons:
+            labels = {btn.key: btn.label for btn in session.query(Button).all()}
+            markup = InlineKeyboardMarkup([
+                [InlineKeyboardButton(text=labels.get(key, f"❓{key}"), callback_data=key) for key in row]
+                for row in json.loads(raw_buttons)
+            ])
+        return text, markup
+    finally:
+        session.close()
+
+
+def main(number: int = 200) -> None:
+    init_db()
+    with SessionLocal() as session:
+        state_keys = [state.state_key for state in session.query(State).all()]
+    install_snapshot(build_snapshot_from_db())
+
+    user = User(user_id=1, name="Бенчмарк", role="admin", state=None, last_message_id=None, is_workday=False,
+                daily_report_draft={"date": "01.06.2025", "author": "Бенчмарк(1)", "wolt": 100.0, "bolt": 200.0,
+                                    "yandex": 300.0, "temp": 25.0, "weather_label": "Ясно или малооблачно",
+                                    "overwrite": False})
+    screens = [(state_key, role) for state_key in state_keys for role in ROLES]
+
+    async def _load_draft():
+        # новый путь читает черновик из хранилища черновиков, старый — из JSON-колонки
+        try:
+            user._draft = await load_draft(user.user_id, user.daily_report_draft)
+        finally:
+            await async_engine.dispose()
+    asyncio.run(_load_draft())
+
+    def run_legacy():
+        for state_key, role in screens:
+            user.state, user.role = state_key, role
+            _legacy_render(user, "комментарий\n")
+
+    def run_cached():
+        for state_key, role in screens:
+            user.state, user.role = state_key, role
+            BotMessage(user, chat_id=1, comment="комментарий\n")
+
+    legacy = timeit.timeit(run_legacy, number=number)
+    cached = timeit.timeit(run_cached, number=number)
+    renders = number * len(screens)
+    print(f"Экранов (состояние × роль): {len(screens)}, рендеров на вариант: {renders}")
+    print(f"до:    {legacy / renders * 1e6:9.1f} мкс/рендер")
+    print(f"после: {cached / renders * 1e6:9.1f} мкс/рендер")
+    print(f"ускорение: x{legacy / cached:.1f}")
+
+
+if __name__ == "__main__":
+    try:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
+    finally:
+        engine.dispose()
+        shutil.rmtree(_TMP_DIR, ignore_errors=True)
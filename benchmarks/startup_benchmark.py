@@ -0,0 +1,139 @@
+"""
+Бенчмарк старта бота: время от запуска процесса до обработки первого обновления (ответ на /start).
+Сравниваются два режима: синхронизация с Google Sheets до запуска опроса (OFFLINE_FIRST_STARTUP = False)
+и старт на локальной БД с синхронизацией в фоне (OFFLINE_FIRST_STARTUP = True).
+Telegram Bot API подменяется фиктивным запросом, Google Sheets — клиентом из config_sync_benchmark
+с задержкой сети на каждый запрос.
+
+Запуск из корня репозитория (нужны DATABASE_PATH и BOT_TOKEN в .env или окружении, в БД — хотя бы один пользователь):
+    python -m benchmarks.startup_benchmark [задержка запроса к Google, мс] [повторов]
+
+Каждый запуск бота работает со свежей временной копией БД (init_db, синхронизация и фоновые задачи меняют её),
+запросы к Open-Meteo подменяются пустым ответом: рабочая БД и внешние сервисы не затрагиваются.
+"""
+import atexit
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+
+CHILD_FLAG = "--child"
+
+
+def _run_child(offline_first: bool, user_id: int, latency_ms: float) -> None:
+    import config
+    config.OFFLINE_FIRST_STARTUP = offline_first
+
+    from telegram.request import HTTPXRequest
+
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 1, "date": int(time.time()), "text": "/start",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Бенчмарк"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+    pending_updates = [update]
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        import asyncio
+        endpoint = url.rsplit("/", 1)[-1]
+        if endpoint == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "bot", "username": "benchmark_bot"}
+        elif endpoint == "getUpdates":
+            result, pending_updates[:] = list(pending_updates), []
+            if not result:
+                await asyncio.sleep(0.05)
+        elif endpoint in ("sendMessage", "editMessageText"):
+            # первое обновление обработано — печатаем момент ответа и выходим, не дожидаясь остановки бота
+            print(json.dumps({"handled_at": time.time()}), flush=True)
+            os._exit(0)
+        else:
+            result = True
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    HTTPXRequest.do_request = do_request
+
+    import bot
+    atexit.unregister(bot.shutdown_hook)
+
+    from utils import db_sync, google_sheets, weather
+
+    def _get_fake_client():
+        # как и настоящий клиент, фиктивный (вместе с gspread) создаётся при первом обращении к Google
+        if google_sheets._client is None:
+            import benchmarks.config_sync_benchmark as fake_google
+            google_sheets._client = fake_google.FakeClient(fake_google._sheets_from_db(), latency_ms / 1000)
+        return google_sheets._client
+
+    async def _fetch_no_weather(date_str, locations):
+        return {}
+
+    db_sync.BOT_CONFIG_SHEET_ID = "benchmark"
+    google_sheets._get_client = _get_fake_client
+    weather._fetch_weather = _fetch_no_weather
+
+    bot.main()
+
+
+def _copy_database(source_file: str, tmp_dir: str) -> str:
+    """
+    Копирует БД во временный каталог через backup API SQLite (вместе с журналом WAL) и возвращает DATABASE_PATH копии.
+    """
+    copy_file = os.path.join(tmp_dir, os.path.basename(source_file))
+    source, target = sqlite3.connect(source_file), sqlite3.connect(copy_file)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return f"sqlite:///{copy_file}"
+
+
+def _measure(offline_first: bool, user_id: int, latency_ms: float, source_file: str) -> float:
+    tmp_dir = tempfile.mkdtemp(prefix="startup_benchmark_")
+    try:
+        env = {**os.environ, "DATABASE_PATH": _copy_database(source_file, tmp_dir)}
+        started = time.time()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_benchmark", CHILD_FLAG, str(int(offline_first)),
+             str(user_id), str(latency_ms)],
+            capture_output=True, text=True, timeout=120, env=env,
+        ).stdout
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    for line in output.splitlines():
+        if line.startswith("{"):
+            return json.loads(line)["handled_at"] - started
+    raise RuntimeError("бот не ответил на /start")
+
+
+def main(latency_ms: float = 300, repeats: int = 3) -> None:
+    load_dotenv()
+    source_file = os.environ["DATABASE_PATH"].replace("sqlite:///", "")
+    connection = sqlite3.connect(f"file:{source_file}?mode=ro", uri=True)
+    try:
+        user_id = connection.execute("SELECT user_id FROM users LIMIT 1").fetchone()[0]
+    finally:
+        connection.close()
+
+    print(f"Задержка запроса к Google Sheets: {latency_ms:.0f} мс, повторов: {repeats}")
+    for title, offline_first in (("до (синхронизация до старта)", False), ("после (старт на локальной БД)", True)):
+        timings = [_measure(offline_first, user_id, latency_ms, source_file) for _ in range(repeats)]
+        print(f"{title:32} первое обновление обработано через {statistics.median(timings):.2f} с (медиана)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == CHILD_FLAG:
+        _run_child(bool(int(sys.argv[2])), int(sys.argv[3]), float(sys.argv[4]))
+    else:
+        main(float(sys.argv[1]) if len(sys.argv) > 1 else 300, int(sys.argv[2]) if len(sys.argv) > 2 else 3)
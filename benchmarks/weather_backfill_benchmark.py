@@ -0,0 +1,45 @@
+"""
+Сравнение скалярного классификатора погоды (utils.weather._analyze_weather, по одному дню) с векторным
+(utils.weather_backfill.analyze_weather_bulk, матрица дни × часы) на случайных данных.
+Проверяет, что результаты совпадают, и печатает время обоих вариантов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.weather_backfill_benchmark [количество дней]
+"""
+import sys
+import time
+
+import numpy as np
+
+from config import WORK_START_HOUR, WORK_END_HOUR
+from utils.weather import _analyze_weather
+from utils.weather_backfill import analyze_weather_bulk
+
+
+def main(days: int = 3650) -> None:
+    rng = np.random.default_rng(42)
+    hours = WORK_END_HOUR - WORK_START_HOUR
+    temps = np.round(rng.normal(22, 8, (days, hours)), 1)
+    clouds = rng.integers(0, 101, (days, hours)).astype(float)
+    # много нулей и значений около порогов, чтобы проверить граничные случаи
+    precips = np.round(rng.choice([0.0, 0.0, 0.0, 0.1, 0.5, 1.9, 2.0, 2.5], (days, hours)), 1)
+
+    started = time.perf_counter()
+    scalar = [_analyze_weather((temps[d].tolist(), clouds[d].tolist(), precips[d].tolist())) for d in range(days)]
+    scalar_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    bulk = analyze_weather_bulk(temps, clouds, precips)
+    bulk_time = time.perf_counter() - started
+
+    mismatches = [d for d in range(days) if scalar[d] != bulk[d]]
+    print(f"Дней: {days}, расхождений: {len(mismatches)}")
+    print(f"скалярно: {scalar_time * 1000:8.1f} мс")
+    print(f"NumPy:    {bulk_time * 1000:8.1f} мс")
+    if mismatches:
+        d = mismatches[0]
+        raise SystemExit(f"Результаты не совпадают, например день {d}: {scalar[d]} != {bulk[d]}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3650)
@@ -0,0 +1,78 @@
+"""
+Проверка режима webhook: отправляет записанные обновления Telegram на локальный сервер бота (BOT_MODE = "webhook")
+так же, как это делает Telegram, — POST с JSON и заголовком X-Telegram-Bot-Api-Secret-Token, — и печатает коды
+ответов и задержку. Перед отправкой опрашивает маршрут здоровья.
+
+Файл обновлений — JSON Lines, по одному объекту Update на строку (например, выгрузка getUpdates).
+Без файла отправляются синтетические /start от пользователя user_id.
+
+Запуск из корня репозитория (WEBHOOK_SECRET_TOKEN и WEBHOOK_PORT — из .env или окружения):
+    python -m benchmarks.webhook_replay [файл обновлений | user_id] [количество] [адрес сервера]
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+
+from config import WEBHOOK_SECRET_TOKEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_HEALTH_PATH
+from utils.webhook import SECRET_TOKEN_HEADER
+
+
+def _synthetic_updates(user_id: int, count: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "update_id": 100000 + i,
+            "message": {
+                "message_id": 100000 + i, "date": int(time.time()), "text": "/start",
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "Replay"},
+                "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def _load_updates(source: str, count: int) -> List[Dict[str, Any]]:
+    if os.path.exists(source):
+        with open(source, encoding="utf-8") as f:
+            updates = [json.loads(line) for line in f if line.strip()]
+        return updates[:count] if count else updates
+    return _synthetic_updates(int(source), count or 10)
+
+
+async def main(source: str, count: int, base_url: str) -> None:
+    updates = _load_updates(source, count)
+    headers = {SECRET_TOKEN_HEADER: WEBHOOK_SECRET_TOKEN or ""}
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}{WEBHOOK_HEALTH_PATH}") as response:
+            print(f"{WEBHOOK_HEALTH_PATH}: {response.status} {await response.text()}")
+
+        statuses: Dict[int, int] = {}
+        latencies = []
+        for update in updates:
+            started = time.perf_counter()
+            async with session.post(f"{base_url}{WEBHOOK_PATH}", json=update, headers=headers) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        async with session.post(f"{base_url}{WEBHOOK_PATH}", json=updates[0],
+                                headers={SECRET_TOKEN_HEADER: "wrong"}) as response:
+            print(f"запрос с неверным секретом: {response.status}")
+
+    print(f"Отправлено обновлений: {len(updates)}, коды ответов: {statuses}")
+    print(f"задержка ответа: медиана {statistics.median(latencies):.1f} мс, максимум {max(latencies):.1f} мс")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        sys.argv[1] if len(sys.argv) > 1 else "1",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 0,
+        sys.argv[3] if len(sys.argv) > 3 else f"http://127.0.0.1:{WEBHOOK_PORT}",
+    ))
@@ -1,21 +1,39 @@
 import os
+import asyncio
 import atexit
 import shutil
 import glob
 import logging
 import utils.logger # noqa: F401
-from datetime import datetime
-from config import BOT_TOKEN, DATABASE_PATH
-from utils.models.base import engine
+import pytz
+from datetime import datetime, time
+from config import BOT_TOKEN, DATABASE_PATH, WORK_END_HOUR, WEATHER_PREFETCH_DELAY_MINUTES, TIMEZONE, \
+    REPORT_INDEX_RECONCILE_MINUTES, REPORT_OUTBOX_INTERVAL_SECONDS, SHEETS_STATS_INTERVAL_MINUTES, \
+    USERS_WRITEBACK_INTERVAL_SECONDS, CONFIG_RELOAD_MINUTES, OFFLINE_FIRST_STARTUP, BOT_MODE, WEBHOOK_URL, \
+    WEBHOOK_SECRET_TOKEN, UPDATE_CONCURRENCY, UPDATE_MAX_PENDING
+from utils.models.base import engine, async_engine, init_db, SessionLocal
+from utils.models.config_snapshot import build_snapshot_from_db, install_snapshot
+from utils.models.report_draft import checkpoint_drafts
+from utils.models.state import State
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
-from handlers.common_handlers import back_button_callback_handler, nope_button_callback_handler, \
-    yes_button_callback_handler
-from handlers.manage_bot import manage_bot_callback_handler
+# модули обработчиков регистрируют свои маршруты кнопок в router при импорте
+import handlers.common_handlers  # noqa: F401
+import handlers.main_menu  # noqa: F401
+import handlers.manage_bot  # noqa: F401
 from handlers.commands import command_handler
-from handlers.daily_report import daily_report_message_handler, daily_report_callback_handler
-from handlers.main_menu import main_menu_callback_handler
+from handlers.daily_report import daily_report_message_handler
+from handlers.router import router
 from dotenv import load_dotenv
-from utils.db_sync import update_from_google_to_db
+from utils.db_sync import update_from_google_to_db, reload_config_job
+from utils.executor import shutdown_executor
+from utils.report_index import reconcile_report_index_job
+from utils.report_outbox import report_outbox_job
+from utils.sheets_quota import log_sheets_stats, log_sheets_stats_job
+from utils.telegram_outbound import outbound
+from utils.update_processor import UnitOfWorkUpdateProcessor, unit_of_work_error_handler
+from utils.user_writeback import flush_user_changes, users_writeback_job
+from utils.weather import close_weather_session, prefetch_today_weather_job, prefetch_startup_weather_job
+from utils.webhook import run_webhook
 
 
 logger = logging.getLogger(__name__)
@@ -27,14 +45,23 @@ def shutdown_hook() -> None:
     """
     logger.info("[shutdown_hook] 🛑 Начинаю процедуру завершения работы бота…")
 
-    # 1) Корректно «слить» соединения SQLAlchemy
+    # 1) Остановить пул потоков для блокирующего I/O и записать итоговую статистику квоты Google Sheets
     try:
+        shutdown_executor()
+        log_sheets_stats()
+    except Exception as e:
+        logger.error(f"[shutdown_hook] ❌ Ошибка при остановке пула потоков: {e}")
+
+    # 2) Перенести журнал WAL в основной файл (иначе бэкап файла будет неполным) и «слить» соединения SQLAlchemy
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
         engine.dispose()
         logger.info("[shutdown_hook] ✅ SQLAlchemy engine.dispose() выполнен")
     except Exception as e:
         logger.error(f"[shutdown_hook] ❌ Ошибка при отключении от БД: {e}")
 
-    # 2) Создать бэкап файла SQLite
+    # 3) Создать бэкап файла SQLite
     try:
         # получаем путь к файлу базы
         db_file = DATABASE_PATH.replace("sqlite:///", "")
@@ -70,7 +97,7 @@ def shutdown_hook() -> None:
     except Exception as e:
         logger.error(f"❌ Ошибка при бэкапе и ротации БД: {e}")
 
-    # 3) Сброс и закрытие всех логгеров
+    # 4) Сброс и закрытие всех логгеров
     root_logger = logging.getLogger()
     for handler in list(root_logger.handlers):
         try:
@@ -84,30 +111,85 @@ def shutdown_hook() -> None:
 atexit.register(shutdown_hook)
 
 
+async def post_shutdown(application: Application) -> None:
+    # незаписанные черновики отчётов сохраняем в БД, а изменения пользователей выгружаем, пока пул потоков ещё работает
+    await checkpoint_drafts()
+    await flush_user_changes()
+    await close_weather_session()
+    await async_engine.dispose()
+
+
+def _init_from_local_db() -> bool:
+    """
+    Готовит бота к работе на локальной БД без обращения к Google Sheets.
+    Возвращает False, если в БД ещё нет конфигурации (первый запуск).
+    """
+    init_db()
+    with SessionLocal() as session:
+        if session.query(State.state_key).first() is None:
+            return False
+    install_snapshot(build_snapshot_from_db())
+    return True
+
+
 def main():
     logger.info("[bot.py] Инициализация базы данных...")
+    background_sync = False
     try:
-        update_from_google_to_db()
-        # init_db()
-
-        logger.info("[bot.py] ✅ База данных инициализирована")
+        background_sync = OFFLINE_FIRST_STARTUP and _init_from_local_db()
+        if background_sync:
+            logger.info("[bot.py] ✅ Конфигурация загружена из локальной БД, синхронизация с Google Sheets — в фоне")
+        else:
+            update_from_google_to_db()
+            logger.info("[bot.py] ✅ База данных инициализирована")
     except Exception as e:
         logger.exception(f"[bot.py] ❌ Ошибка при инициализации базы: {e}")
 
     logger.info("[main] Запуск бота...")
-    app = Application.builder().token(BOT_TOKEN).build()
+    # обновления разных пользователей обрабатываются параллельно, одного пользователя — по очереди; изменения
+    # пользователей за обновление сохраняются одним коммитом; все исходящие запросы к Bot API проходят
+    # через планировщик с лимитами Telegram
+    app = Application.builder().token(BOT_TOKEN).post_shutdown(post_shutdown) \
+        .concurrent_updates(UnitOfWorkUpdateProcessor(max_concurrent_updates=UPDATE_MAX_PENDING,
+                                                      concurrency=UPDATE_CONCURRENCY)) \
+        .rate_limiter(outbound).build()
 
-    app.add_handler(CommandHandler(["start", "daily_report"], command_handler))
-    app.add_handler(CallbackQueryHandler(main_menu_callback_handler, pattern="^main_menu."))
-    app.add_handler(CallbackQueryHandler(daily_report_callback_handler, pattern="^daily_report."))
-    app.add_handler(CallbackQueryHandler(yes_button_callback_handler, pattern="^yes"))
-    app.add_handler(CallbackQueryHandler(nope_button_callback_handler, pattern="^nope"))
-    app.add_handler(CallbackQueryHandler(back_button_callback_handler, pattern="^back"))
-    app.add_handler(CallbackQueryHandler(manage_bot_callback_handler, pattern="^manage_bot."))
+    app.add_handler(CommandHandler(["start", "daily_report", "backfill_weather", "reload_config"], command_handler))
+    app.add_handler(CallbackQueryHandler(router.dispatch))
 
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, daily_report_message_handler))
-    logger.info("Бот запущен. Ждём обновлений...")
-    app.run_polling()
+    # ошибка обработчика отменяет изменения, накопленные в единице работы обновления
+    app.add_error_handler(unit_of_work_error_handler)
+
+    if app.job_queue:
+        prefetch_time = time(hour=WORK_END_HOUR, minute=WEATHER_PREFETCH_DELAY_MINUTES, tzinfo=pytz.timezone(TIMEZONE))
+        app.job_queue.run_daily(prefetch_today_weather_job, time=prefetch_time, name="prefetch_today_weather")
+        app.job_queue.run_once(prefetch_startup_weather_job, when=0, name="prefetch_startup_weather")
+        app.job_queue.run_repeating(reconcile_report_index_job, interval=REPORT_INDEX_RECONCILE_MINUTES * 60,
+                                    first=0, name="reconcile_report_index")
+        app.job_queue.run_repeating(report_outbox_job, interval=REPORT_OUTBOX_INTERVAL_SECONDS, first=0,
+                                    name="report_outbox")
+        app.job_queue.run_repeating(users_writeback_job, interval=USERS_WRITEBACK_INTERVAL_SECONDS,
+                                    first=USERS_WRITEBACK_INTERVAL_SECONDS, name="users_writeback")
+        # при старте с локальной БД первая синхронизация запускается сразу после начала опроса
+        app.job_queue.run_repeating(reload_config_job, interval=CONFIG_RELOAD_MINUTES * 60,
+                                    first=0 if background_sync else CONFIG_RELOAD_MINUTES * 60, name="reload_config")
+        app.job_queue.run_repeating(log_sheets_stats_job, interval=SHEETS_STATS_INTERVAL_MINUTES * 60,
+                                    first=SHEETS_STATS_INTERVAL_MINUTES * 60, name="sheets_stats")
+    else:
+        logger.warning("[main] JobQueue недоступен (не установлен APScheduler) — фоновые задачи не запущены")
+        if background_sync:
+            logger.warning("[main] Конфигурация из Google Sheets не будет синхронизирована в фоне — используйте "
+                           "/reload_config")
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL or not WEBHOOK_SECRET_TOKEN:
+            logger.error("[main] Для режима webhook нужны WEBHOOK_URL и WEBHOOK_SECRET_TOKEN — бот не запущен")
+            return
+        logger.info("Бот запущен в режиме webhook. Ждём обновлений...")
+        asyncio.run(run_webhook(app))
+    else:
+        logger.info("Бот запущен. Ждём обновлений...")
+        app.run_polling()
 
 if __name__ == "__main__":
     main()
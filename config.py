@@ -4,6 +4,16 @@ from dotenv import load_dotenv
 load_dotenv()
 
 BOT_TOKEN = os.environ.get("BOT_TOKEN")
+# Получение обновлений: "polling" — опрос getUpdates, "webhook" — Telegram присылает их на встроенный
+# HTTP-сервер (aiohttp). Для webhook нужны публичный адрес WEBHOOK_URL (https, без пути) и секрет
+# WEBHOOK_SECRET_TOKEN (1–256 символов A-Z, a-z, 0-9, _ и -), который Telegram передаёт в каждом запросе
+BOT_MODE = os.environ.get("BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+WEBHOOK_SECRET_TOKEN = os.environ.get("WEBHOOK_SECRET_TOKEN")
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = "/telegram"
+WEBHOOK_HEALTH_PATH = "/health"
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
 WEATHER_ASSISTANT_ID = os.environ.get("WEATHER_ASSISTANT_ID")
 
@@ -12,9 +22,81 @@ BOT_CONFIG_SHEET_ID = os.environ.get("BOT_CONFIG_SHEET_ID")
 
 CREDS_FILE_PATH = os.environ.get("CREDS_FILE_PATH")
 DATABASE_PATH=os.environ.get("DATABASE_PATH")
+# SQLite: WAL — чтение не ждёт записи, synchronous=NORMAL — без fsync на каждый коммит (в WAL это безопасно),
+# кэш страниц 16 МБ, ожидание блокировки до 5 с вместо ошибки 'database is locked'
+SQLITE_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -16000,
+                  "busy_timeout": 5000, "temp_store": "MEMORY"}
+DB_POOL_SIZE = 5
+DB_MAX_OVERFLOW = 10
+# Сколько пользователей держать в памяти (LRU-кэш User.get)
+USER_CACHE_SIZE = 256
+# Параллельная обработка обновлений: обновления разных пользователей обрабатываются одновременно (не больше
+# UPDATE_CONCURRENCY обработчиков сразу), обновления одного пользователя — строго по очереди.
+# UPDATE_MAX_PENDING — сколько обновлений может ждать своей очереди, прежде чем бот перестанет брать новые
+UPDATE_CONCURRENCY = 8
+UPDATE_MAX_PENDING = 256
 DAILY_REPORT_LOG_FILE=os.environ.get("DAILY_REPORT_LOG_FILE")
 
 OPENMETEO_LATITUDE = 41.7223
 OPENMETEO_LONGITUDE = 44.8046
+# Точки продаж: ключ → (широта, долгота). Ключ указывается в колонке 'location' листа 'users';
+# пользователи без точки относятся к DEFAULT_LOCATION.
+LOCATIONS = {
+    "main": (OPENMETEO_LATITUDE, OPENMETEO_LONGITUDE),
+}
+DEFAULT_LOCATION = "main"
 WORK_START_HOUR = 9
 WORK_END_HOUR = 19
+OPENMETEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPENMETEO_TIMEOUT = 10
+# Архив прогнозов Open-Meteo — для заполнения погоды в отчётах за прошлые месяцы
+OPENMETEO_HISTORICAL_URL = "https://historical-forecast-api.open-meteo.com/v1/forecast"
+OPENMETEO_HISTORICAL_TIMEOUT = 60
+# Сколько минут считается свежей погода, полученная до конца рабочего дня
+# (данные, полученные после WORK_END_HOUR, окончательные и не устаревают)
+WEATHER_TODAY_TTL_MINUTES = 30
+# Через сколько минут после WORK_END_HOUR заранее загружать погоду за сегодня
+WEATHER_PREFETCH_DELAY_MINUTES = 15
+TIMEZONE = "Asia/Tbilisi"
+
+# Пул потоков для блокирующих вызовов (Google Sheets, HTTP) и ограничения параллельности по бэкендам
+IO_MAX_WORKERS = 8
+# google_bulk — массовые операции администратора и фоновые сверки: один поток, чтобы не занимать слоты интерактивных запросов;
+# db — синхронные транзакции SQLite, которые вызываются из цикла событий (SQLite всё равно пишет по одной)
+IO_BACKEND_LIMITS = {"google": 4, "google_bulk": 1, "db": 2}
+GOOGLE_API_TIMEOUT = 20
+
+# Квота Google Sheets API (запросов в минуту на пользователя) и сколько секунд запрос каждого приоритета
+# (0 — интерактивный, 1 — запись отчётов, 2 — массовые операции) может ждать квоту, прежде чем будет отклонён
+SHEETS_REQUESTS_PER_MINUTE = 60
+SHEETS_MAX_WAIT_SECONDS = {0: 15, 1: 120, 2: 600}
+# Повторы после ответа 429: экспоненциальная задержка от base до max секунд
+SHEETS_RETRY_LIMIT = 5
+SHEETS_BACKOFF_BASE_SECONDS = 2
+SHEETS_BACKOFF_MAX_SECONDS = 64
+SHEETS_STATS_INTERVAL_MINUTES = 60
+
+# Исходящие запросы к Telegram Bot API: общий лимит бота (запросов в секунду) и лимит на чат — скорость
+# и запас для коротких всплесков (правка «Подожди…» сразу после нажатия кнопки). После RetryAfter все запросы
+# ждут указанное Telegram время, запрос повторяется не больше TELEGRAM_MAX_RETRIES раз
+TELEGRAM_GLOBAL_PER_SECOND = 30
+TELEGRAM_CHAT_PER_SECOND = 1
+TELEGRAM_CHAT_BURST = 3
+TELEGRAM_MAX_RETRIES = 3
+# Промежуточный экран («загружаю…») показывается, только если итоговый не готов за столько секунд:
+# иначе обе правки сливаются в одну
+TELEGRAM_PLACEHOLDER_DELAY_SECONDS = 0.5
+
+# Как часто сверять локальный индекс отчётов с листом 'reports'
+REPORT_INDEX_RECONCILE_MINUTES = 30
+# Очередь отчётов на запись в лист 'reports': интервал фоновой отправки и экспоненциальная задержка при ошибках
+REPORT_OUTBOX_INTERVAL_SECONDS = 30
+REPORT_OUTBOX_RETRY_BASE_SECONDS = 30
+REPORT_OUTBOX_RETRY_MAX_SECONDS = 30 * 60
+# Как часто выгружать изменения пользователей в лист 'users'
+USERS_WRITEBACK_INTERVAL_SECONDS = 60
+# Как часто перечитывать конфигурацию бота (листы 'states', 'ru_buttons', 'users') без перезапуска
+CONFIG_RELOAD_MINUTES = 5
+# Старт без ожидания Google Sheets: бот сразу работает на локальной БД, синхронизация идёт в фоне после
+# запуска опроса. При пустой БД (первый запуск) синхронизация всё равно выполняется до старта
+OFFLINE_FIRST_STARTUP = True
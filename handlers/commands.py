@@ -1,3 +1,5 @@
+import html
+from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes, CallbackContext
 
@@ -7,22 +9,24 @@ from utils.models.messages import BotMessage
 import logging
 import utils.logger # noqa: F401
 from utils.tools import delete_message_from_user
+from utils.db_sync import reload_config
+from utils.models.config_snapshot import ConfigError
 
 logger = logging.getLogger(__name__)
 
 async def command_handler(update: Update, context: CallbackContext):
     await delete_message_from_user(update, context)
-    user = User.get(update.effective_user.id)
+    user = await User.get(update.effective_user.id)
     chat_id = update.effective_chat.id
     command = update.effective_message.text.split()[0][1:]
 
     if command == "start":
         try:
-            user = User.get(user.user_id)
+            user = await User.get(user.user_id)
             if user:
-                user.set_state("main_menu")
+                await user.set_state("main_menu")
             else:
-                user = User.create(user_id=user.user_id,
+                user = await User.create(user_id=user.user_id,
                                    role="guest",
                                    state="guest",
                                    first_name=update.effective_user.first_name,
@@ -40,12 +44,51 @@ async def command_handler(update: Update, context: CallbackContext):
                          f"{user.name}({user.user_id}) - '{e}'")
         return
 
+    elif command == "backfill_weather" and user.role == "admin":
+        args = update.effective_message.text.split()[1:]
+        try:
+            start_date, end_date = args
+            for date in args:
+                datetime.strptime(date, "%d.%m.%Y")
+        except ValueError:
+            comment = "⚠️ Формат команды: /backfill_weather ДД.ММ.ГГГГ ДД.ММ.ГГГГ\n"
+        else:
+            # numpy нужен только здесь — не тянем его при старте бота
+            from utils.weather_backfill import backfill_weather
+            try:
+                days, rows = await backfill_weather(start_date, end_date)
+                comment = f"✅ Погода получена за {days} дн., обновлено строк в отчётах: {rows}\n"
+            except Exception as e:
+                logger.exception(f"[command_handler] Ошибка при заполнении погоды за {start_date} — {end_date} "
+                                 f"у пользователя {user.name}({user.user_id}) - {e}")
+                comment = "❌ Не удалось заполнить погоду. Обратитесь к администратору.\n"
+        await user.set_state("main_menu.manage_bot")
+        await BotMessage(user, chat_id, comment=comment).send(context)
+        return
+
+    elif command == "reload_config" and user.role == "admin":
+        try:
+            summaries = await reload_config()
+            comment = "✅ Конфигурация обновлена: " + ", ".join(str(summary) for summary in summaries) + "\n"
+        except ConfigError as e:
+            logger.error(f"[command_handler] Конфигурация от пользователя {user.name}({user.user_id}) "
+                         f"не применена: {e}")
+            comment = f"❌ Конфигурация не применена, бот работает на прежней.\n{html.escape(str(e))}\n"
+        except Exception as e:
+            logger.exception(f"[command_handler] Ошибка при перезагрузке конфигурации "
+                             f"у пользователя {user.name}({user.user_id}) - {e}")
+            comment = "❌ Не удалось перечитать конфигурацию. Обратитесь к администратору.\n"
+        user = await User.get(user.user_id)
+        await user.set_state("main_menu.manage_bot")
+        await BotMessage(user, chat_id, comment=comment).send(context)
+        return
+
     else:
         logger.error(f"[command_handler] От пользователя {user.name}({user.user_id}) получена "
                      f"неизвестныая команда: {command}. "
                      f"Сообщаю об ошибке и направляю в основное меню.")
         comment = "❌ Неизвестная ошибка. Обратитесь к администратору.\n"
-        user.set_state("main_menu")
+        await user.set_state("main_menu")
         await BotMessage(user, chat_id, comment=comment).send(context)
 
 
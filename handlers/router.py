@@ -0,0 +1,109 @@
+import logging
+import utils.logger # noqa: F401
+from typing import Awaitable, Callable, Dict, Mapping, Optional, Set, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from utils.models.messages import BotMessage
+from utils.models.user import User
+
+logger = logging.getLogger(__name__)
+
+RouteHandler = Callable[[Update, ContextTypes.DEFAULT_TYPE, User], Awaitable[None]]
+
+
+def _prefix(data: str) -> str:
+    # 'daily_report.weather_label.clear' → 'daily_report.weather_label', 'main_menu.exit' → 'main_menu', 'yes' → 'yes'
+    return data.rpartition(".")[0] or data
+
+
+class CallbackRouter:
+    """
+    Единый обработчик нажатий inline-кнопок. Маршруты хранятся в словаре по ключу (префикс, состояние, data);
+    None в состоянии или data означает «любое». Поиск — не больше четырёх обращений к словарю, от точного
+    маршрута к общему: (префикс, состояние, data) → (префикс, *, data) → (префикс, состояние, *) → (префикс, *, *).
+    Обработчик маршрута получает (update, context, user) и сам отвечает на нажатие и перерисовывает экран.
+    Нажатие с известным префиксом, но не подходящее текущему состоянию (устаревшая кнопка, двойное нажатие),
+    подтверждается и игнорируется; в основное меню с ошибкой направляет только data, которых не знает ни один маршрут.
+    """
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, Optional[str], Optional[str]], RouteHandler] = {}
+        self._prefixes: Set[str] = set()
+
+    def add(self, handler: RouteHandler, data: Optional[str] = None, state: Optional[str] = None,
+            prefix: Optional[str] = None) -> None:
+        if (data is None) == (prefix is None):
+            raise ValueError("Для маршрута нужно указать либо data, либо prefix")
+        key = (_prefix(data) if data is not None else prefix, state, data)
+        if key in self._routes:
+            raise ValueError(f"Маршрут {key} уже зарегистрирован")
+        self._routes[key] = handler
+        self._prefixes.add(key[0])
+
+    def route(self, data: Optional[str] = None, state: Optional[str] = None,
+              prefix: Optional[str] = None) -> Callable[[RouteHandler], RouteHandler]:
+        def decorator(handler: RouteHandler) -> RouteHandler:
+            self.add(handler, data=data, state=state, prefix=prefix)
+            return handler
+        return decorator
+
+    def transitions(self, data: str, states: Mapping[Optional[str], str]) -> None:
+        """
+        Маршруты-переходы: нажатие data в состоянии (ключ) переводит пользователя в новое состояние (значение).
+        """
+        for state, new_state in states.items():
+            self.add(_transition(new_state), data=data, state=state)
+
+    def resolve(self, data: str, state: Optional[str]) -> Optional[RouteHandler]:
+        prefix = _prefix(data)
+        routes = self._routes
+        return (routes.get((prefix, state, data)) or routes.get((prefix, None, data))
+                or routes.get((prefix, state, None)) or routes.get((prefix, None, None)))
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        user = await User.get(query.from_user.id)
+        if user is None:
+            logger.warning(f"[CallbackRouter] Нажатие '{query.data}' от незарегистрированного пользователя "
+                           f"{query.from_user.id}")
+            await query.answer()
+            return
+        logger.debug(f"[CallbackRouter] {user.name}({user.user_id}): '{query.data}' в состоянии '{user.state}'")
+        data = query.data or ""
+        handler = self.resolve(data, user.state)
+        if handler is None:
+            if _prefix(data) in self._prefixes:
+                await self.stale(update, user)
+            else:
+                await self.unmatched(update, context, user)
+            return
+        await handler(update, context, user)
+
+    async def stale(self, update: Update, user: User) -> None:
+        query = update.callback_query
+        logger.info(f"[CallbackRouter] Пользователь {user.name}({user.user_id}) нажал '{query.data}' "
+                    f"в состоянии {user.state}, где эта кнопка не действует. Игнорирую.")
+        await query.answer()
+
+    async def unmatched(self, update: Update, context: ContextTypes.DEFAULT_TYPE, user: User) -> None:
+        query = update.callback_query
+        logger.error(f"[CallbackRouter] От пользователя {user.name}({user.user_id}) получены "
+                     f"неизвестные для состояния {user.state} callback data ({query.data}). "
+                     f"Сообщаю об ошибке и направляю в основное меню.")
+        await user.set_state("main_menu")
+        await query.answer()
+        await BotMessage(user, update.effective_chat.id, comment="❌ Неизвестная ошибка. Обратитесь к администратору.\n"
+                         ).edit(context)
+
+
+def _transition(new_state: str) -> RouteHandler:
+    async def handler(update: Update, context: ContextTypes.DEFAULT_TYPE, user: User) -> None:
+        await user.set_state(new_state)
+        await update.callback_query.answer()
+        await BotMessage(user, update.effective_chat.id).edit(context)
+    return handler
+
+
+router = CallbackRouter()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Тесты работают с временной БД и пишут лог во временный каталог: переменные окружения должны быть заданы
+# до первого импорта config, а utils.logger создаёт data/bot.log относительно текущего каталога
+_tmp_dir = tempfile.mkdtemp(prefix="bot_tests_")
+os.environ["DATABASE_PATH"] = f"sqlite:///{os.path.join(_tmp_dir, 'bot_database.db')}"
+os.environ.setdefault("BOT_TOKEN", "123456:TEST")
+os.chdir(_tmp_dir)
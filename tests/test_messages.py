@@ -0,0 +1,26 @@
+from collections import OrderedDict
+
+from utils.models import messages
+
+
+def test_rendered_fingerprints_are_bounded(monkeypatch):
+    monkeypatch.setattr(messages, "USER_CACHE_SIZE", 3)
+    monkeypatch.setattr(messages, "_rendered", OrderedDict())
+
+    for user_id in range(5):
+        messages._remember_rendered(user_id, 100 + user_id, f"отпечаток {user_id}")
+
+    assert list(messages._rendered) == [2, 3, 4]
+    assert messages._rendered[4] == (104, "отпечаток 4")
+
+
+def test_rerendered_user_is_evicted_last(monkeypatch):
+    monkeypatch.setattr(messages, "USER_CACHE_SIZE", 2)
+    monkeypatch.setattr(messages, "_rendered", OrderedDict())
+
+    messages._remember_rendered(1, 10, "а")
+    messages._remember_rendered(2, 20, "б")
+    messages._remember_rendered(1, 11, "в")
+    messages._remember_rendered(3, 30, "г")
+
+    assert dict(messages._rendered) == {1: (11, "в"), 3: (30, "г")}
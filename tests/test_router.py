@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+import handlers.router as router_module
+from handlers.router import CallbackRouter
+
+
+class _Query:
+    def __init__(self, data: str):
+        self.data = data
+        self.from_user = SimpleNamespace(id=1)
+        self.answered = 0
+
+    async def answer(self):
+        self.answered += 1
+
+
+def _dispatch(router: CallbackRouter, data: str, state: str, monkeypatch) -> tuple:
+    calls = []
+    user = SimpleNamespace(user_id=1, name="Тест", state=state)
+
+    async def get(user_id):
+        return user
+
+    async def unmatched(update, context, user):
+        calls.append("unmatched")
+
+    monkeypatch.setattr(router_module.User, "get", get)
+    monkeypatch.setattr(router, "unmatched", unmatched)
+    query = _Query(data)
+    asyncio.run(router.dispatch(SimpleNamespace(callback_query=query), None))
+    return calls, query.answered
+
+
+def _router(calls: list) -> CallbackRouter:
+    router = CallbackRouter()
+
+    @router.route("daily_report.today", state="daily_report.date_entering")
+    async def today(update, context, user):
+        calls.append("today")
+
+    return router
+
+
+def test_route_for_current_state_is_called(monkeypatch):
+    handled = []
+    calls, _ = _dispatch(_router(handled), "daily_report.today", "daily_report.date_entering", monkeypatch)
+    assert (handled, calls) == (["today"], [])
+
+
+def test_stale_press_is_answered_and_ignored(monkeypatch):
+    handled = []
+    calls, answered = _dispatch(_router(handled), "daily_report.today", "daily_report.wolt", monkeypatch)
+    assert (handled, calls, answered) == ([], [], 1)
+
+
+def test_unknown_data_goes_to_unmatched(monkeypatch):
+    handled = []
+    calls, _ = _dispatch(_router(handled), "unknown.button", "daily_report.wolt", monkeypatch)
+    assert (handled, calls) == ([], ["unmatched"])
@@ -0,0 +1,59 @@
+from utils.db_sync import upsert_buttons, upsert_users
+from utils.models import Button, SessionLocal, User, init_db
+
+
+def setup_module() -> None:
+    init_db()
+
+
+def _user(user_id: int, name: str, sheet_dirty=None) -> User:
+    return User(user_id=user_id, name=name, role="user", state="main_menu", is_workday=False,
+                sheet_dirty=sheet_dirty)
+
+
+def test_buttons_sync_counts():
+    # изменения не коммитятся: тесты не видят таблицы друг друга
+    with SessionLocal() as session:
+        session.query(Button).delete()
+        session.add_all([Button(key="a", label="A"), Button(key="b", label="B"), Button(key="c", label="C")])
+        session.flush()
+
+        summary = upsert_buttons(session, [{"key": "a", "label": "A"}, {"key": "b", "label": "B2"},
+                                           {"key": "d", "label": "D"}])
+
+        assert (summary.inserted, summary.updated, summary.deleted, summary.unchanged) == (1, 1, 1, 1)
+        assert {button.key: button.label for button in session.query(Button)} == {"a": "A", "b": "B2", "d": "D"}
+        session.rollback()
+
+
+def test_repeated_sync_changes_nothing():
+    rows = [{"key": "a", "label": 1}, {"key": "b", "label": "B"}]
+    with SessionLocal() as session:
+        session.query(Button).delete()
+        upsert_buttons(session, rows)
+
+        # число из Google Sheets совпадает со строкой из БД
+        summary = upsert_buttons(session, rows)
+
+        assert (summary.changed, summary.unchanged) == (0, 2)
+        session.rollback()
+
+
+def test_users_sync_deletes_missing_but_keeps_pending():
+    with SessionLocal() as session:
+        session.query(User).delete()
+        session.add_all([_user(1, "Остаётся"), _user(2, "Удалён из листа"),
+                         _user(3, "Ещё не выгружен", sheet_dirty=["user_id", "name"]),
+                         _user(4, "Правка не выгружена", sheet_dirty=["name"])])
+        session.flush()
+
+        summary = upsert_users(session, [
+            {"user_id": 1, "name": "Переименован", "role": "user", "is_workday": False},
+            {"user_id": 4, "name": "Старое имя", "role": "user", "is_workday": False},
+            {"user_id": 5, "name": "Новый", "role": "user", "is_workday": False},
+        ])
+
+        assert (summary.inserted, summary.updated, summary.deleted) == (1, 1, 1)
+        assert {user.user_id: user.name for user in session.query(User)} == {
+            1: "Переименован", 3: "Ещё не выгружен", 4: "Правка не выгружена", 5: "Новый"}
+        session.rollback()
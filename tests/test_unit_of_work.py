@@ -0,0 +1,78 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import Application, MessageHandler, filters
+
+from utils.models import SessionLocal, User, async_engine, init_db
+from utils.update_processor import UnitOfWorkUpdateProcessor, unit_of_work_error_handler
+
+USER_ID = 1001
+
+
+def _message_update(update_id: int, bot) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "текст",
+            "chat": {"id": USER_ID, "type": "private"},
+            "from": {"id": USER_ID, "is_bot": False, "first_name": "Тест"},
+        },
+    }, bot)
+
+
+def _db_user() -> User:
+    with SessionLocal() as session:
+        return session.get(User, USER_ID)
+
+
+async def _process(handler) -> None:
+    app = Application.builder().token("123456:TEST").updater(None) \
+        .concurrent_updates(UnitOfWorkUpdateProcessor(max_concurrent_updates=4, concurrency=2)).build()
+    app.add_handler(MessageHandler(filters.TEXT, handler))
+    app.add_error_handler(unit_of_work_error_handler)
+    # без обращения к Telegram: process_update нужен только инициализированный Application
+    app._initialized = True
+    update = _message_update(1, app.bot)
+    try:
+        await app.update_processor.process_update(update, app.process_update(update))
+    finally:
+        await async_engine.dispose()
+
+
+def setup_module() -> None:
+    init_db()
+    with SessionLocal.begin() as session:
+        session.merge(User(user_id=USER_ID, name="Тест", role="admin", state="main_menu", is_workday=False,
+                           daily_report_draft={}))
+
+
+def test_raising_handler_leaves_db_unchanged():
+    async def handler(update, context):
+        user = await User.get(USER_ID)
+        await user.set_state("daily_report.date")
+        await user.toggle_workday(True)
+        raise RuntimeError("ошибка обработчика")
+
+    asyncio.run(_process(handler))
+
+    user = _db_user()
+    assert (user.state, user.is_workday, user.sheet_dirty) == ("main_menu", False, None)
+    # объект с неудачными изменениями убран из кэша — следующий User.get перечитает пользователя из БД
+    assert asyncio.run(_get_state()) == "main_menu"
+
+
+def test_successful_handler_commits():
+    async def handler(update, context):
+        user = await User.get(USER_ID)
+        await user.set_state("main_menu.settings")
+
+    asyncio.run(_process(handler))
+
+    assert _db_user().state == "main_menu.settings"
+
+
+async def _get_state() -> str:
+    try:
+        return (await User.get(USER_ID)).state
+    finally:
+        await async_engine.dispose()
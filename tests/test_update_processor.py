@@ -0,0 +1,45 @@
+import asyncio
+
+from telegram import Update
+
+from utils.update_processor import UnitOfWorkUpdateProcessor
+
+
+def _update(update_id: int, user_id: int) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": 0, "text": "текст",
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Тест"},
+        },
+    }, None)
+
+
+async def _run(updates) -> list:
+    processor = UnitOfWorkUpdateProcessor(max_concurrent_updates=16, concurrency=4)
+    events = []
+
+    async def handle(update: Update):
+        name = f"{update.effective_user.id}:{update.update_id}"
+        events.append(f"начало {name}")
+        await asyncio.sleep(0.01)
+        events.append(f"конец {name}")
+
+    await asyncio.gather(*(processor.do_process_update(update, handle(update)) for update in updates))
+    assert not processor._user_locks
+    return events
+
+
+def test_updates_of_one_user_are_processed_in_order():
+    events = asyncio.run(_run([_update(update_id, 1) for update_id in range(1, 4)]))
+
+    assert events == ["начало 1:1", "конец 1:1", "начало 1:2", "конец 1:2", "начало 1:3", "конец 1:3"]
+
+
+def test_updates_of_different_users_run_concurrently():
+    events = asyncio.run(_run([_update(1, 1), _update(2, 2), _update(3, 1)]))
+
+    # второй пользователь не ждёт первого, а второе обновление первого пользователя — ждёт его первое
+    assert events.index("начало 2:2") < events.index("конец 1:1")
+    assert events.index("конец 1:1") < events.index("начало 1:3")
@@ -0,0 +1,42 @@
+from utils.models import User
+from utils.models.user import _cache_generation_now, _cache_put, _cache_touch, invalidate_user_cache, \
+    peek_cached_user
+
+USER_ID = 2001
+
+
+def _user(name: str) -> User:
+    return User(user_id=USER_ID, name=name, role="user", state="main_menu", is_workday=False)
+
+
+def teardown_function() -> None:
+    invalidate_user_cache(USER_ID)
+
+
+def test_user_read_before_invalidation_is_not_cached():
+    generation = _cache_generation_now()
+    stale = _user("прочитан до синхронизации")
+    # синхронизация листа 'users' завершилась, пока User.get читал БД
+    invalidate_user_cache()
+
+    _cache_put(stale, generation)
+
+    assert peek_cached_user(USER_ID) is None
+
+
+def test_user_read_after_invalidation_is_cached():
+    invalidate_user_cache()
+    user = _user("свежий")
+
+    _cache_put(user, _cache_generation_now())
+
+    assert peek_cached_user(USER_ID) is user
+
+
+def test_saving_evicted_user_does_not_replace_cached_one():
+    cached = _user("в кэше")
+    _cache_put(cached, _cache_generation_now())
+
+    _cache_touch(_user("вытесненный объект"))
+
+    assert peek_cached_user(USER_ID) is cached
@@ -0,0 +1,53 @@
+import numpy as np
+
+from config import WORK_START_HOUR, WORK_END_HOUR
+from utils.weather import _analyze_weather, _filter_work_hours
+from utils.weather_backfill import _to_days_matrix, analyze_weather_bulk
+
+
+def _random_days(days: int):
+    rng = np.random.default_rng(7)
+    hours = WORK_END_HOUR - WORK_START_HOUR
+    temps = np.round(rng.normal(22, 8, (days, hours)), 1)
+    clouds = rng.integers(0, 101, (days, hours)).astype(float)
+    # значения на порогах классификатора и около них
+    precips = rng.choice([0.0, 0.0, 0.0, 0.05, 0.1, 0.5, 1.9, 2.0, 2.5, 5.0], (days, hours))
+    return temps, clouds, precips
+
+
+def test_bulk_classifier_matches_scalar():
+    temps, clouds, precips = _random_days(2000)
+
+    bulk = analyze_weather_bulk(temps, clouds, precips)
+
+    scalar = [_analyze_weather((temps[d].tolist(), clouds[d].tolist(), precips[d].tolist()))
+              for d in range(len(temps))]
+    assert bulk == scalar
+
+
+def test_bulk_classifier_matches_scalar_on_open_meteo_response():
+    days = 3
+    rng = np.random.default_rng(11)
+    hourly = {
+        "time": [f"2025-07-{day + 1:02d}T{hour:02d}:00" for day in range(days) for hour in range(24)],
+        "temperature_2m": np.round(rng.normal(25, 5, days * 24), 1).tolist(),
+        "cloudcover": rng.integers(0, 101, days * 24).tolist(),
+        "precipitation": rng.choice([0.0, 0.1, 2.0], days * 24).tolist(),
+    }
+
+    dates, temps, clouds, precips = _to_days_matrix(hourly)
+    bulk = analyze_weather_bulk(temps, clouds, precips)
+
+    assert dates == ["01.07.2025", "02.07.2025", "03.07.2025"]
+    for day in range(days):
+        one_day = {name: values[day * 24:(day + 1) * 24] for name, values in hourly.items()}
+        assert bulk[day] == _analyze_weather(_filter_work_hours({"hourly": one_day}))
+
+
+def test_day_with_missing_values_is_none():
+    temps, clouds, precips = _random_days(2)
+    temps[1, 0] = np.nan
+
+    bulk = analyze_weather_bulk(temps, clouds, precips)
+
+    assert bulk[0] is not None and bulk[1] is None
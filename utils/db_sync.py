@@ -1,57 +1,56 @@
+import asyncio
 import logging
 
 from telegram import Update
 
 import utils.logger # noqa: F401
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import json
-import pytz
+import time
 
 from datetime import datetime
 from ast import literal_eval
 
-import gspread
-from google.oauth2.service_account import Credentials
-
-from sqlalchemy import delete
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from telegram.ext import ContextTypes
 
-from config import BOT_CONFIG_SHEET_ID, CREDS_FILE_PATH, DAILY_REPORT_SHEET_ID, DAILY_REPORT_LOG_FILE
+from config import BOT_CONFIG_SHEET_ID, DAILY_REPORT_LOG_FILE, DEFAULT_LOCATION
+from utils.executor import run_io
+from utils.google_sheets import values_batch_get
+from utils.sheets_quota import Priority
+from utils.report_index import lookup_report_row
+from utils.report_outbox import enqueue_report, has_pending_report, flush_report_outbox
 from utils.models.messages import BotMessage
 from utils.models.base import init_db, SessionLocal
+from utils.models.config_snapshot import build_snapshot, install_snapshot, ConfigError
 from utils.models.state import State
 from utils.models.button import Button
-from utils.models.user import User
+from utils.models.user import User, invalidate_user_cache
+from utils.table_sync import sync_table, SyncSummary
 
 logging.basicConfig(level=logging.INFO, format="%(message)s")
 logger = logging.getLogger(__name__)
 
-# === Работа с Google Sheets ===
-def _get_spreadsheet(spreadsheet_id: str) -> gspread.Spreadsheet:
-    try:
-        logger.info("[_get_worksheet] Авторизация по service account...")
-        creds = Credentials.from_service_account_file(
-            CREDS_FILE_PATH,
-            scopes=["https://www.googleapis.com/auth/spreadsheets"]
-        )
-        client = gspread.authorize(creds)
-        spreadsheet = client.open_by_key(spreadsheet_id)
-        return spreadsheet
-
-    except Exception as e:
-        logger.error("[_get_worksheet] Не удалось получить лист %s: %s", spreadsheet_id, e)
-        raise
+_reload_lock = asyncio.Lock()
 
-def _get_tbilisi_datetime():
-    tbilisi_tz = pytz.timezone("Asia/Tbilisi")
-    now = datetime.now(tbilisi_tz)
-    return now.strftime("%d.%m.%y %H:%M")
-
-def fetch_states_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: str) -> List[Dict[str, Any]]:
-    worksheet = spreadsheet.worksheet(worksheet_name)
-    logger.info("[fetch_states_from_google] Лист получен: %s", worksheet.title)
+# === Работа с Google Sheets ===
+def _to_records(values: List[List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Превращает значения листа в список словарей так же, как worksheet.get_all_records():
+    первая строка — заголовки, числа приводятся к int/float, пустые ячейки — "".
+    """
+    from gspread.utils import numericise_all
+
+    if not values:
+        return []
+    header = values[0]
+    return [
+        dict(zip(header, numericise_all(row + [""] * (len(header) - len(row)))))
+        for row in values[1:]
+    ]
 
-    rows = worksheet.get_all_records()
+def _parse_states(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     result: List[Dict[str, Any]] = []
     for row in rows:
         state_name = row.get("state_key")
@@ -68,14 +67,10 @@ def fetch_states_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: s
             "buttons_user": row.get("buttons_user") or None,
         }
         result.append(entry)
-    logger.info("[fetch_states_from_google] Загружено %d состояний из Google Sheets", len(result))
+    logger.info("[_parse_states] Загружено %d состояний из Google Sheets", len(result))
     return result
 
-def fetch_buttons_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: str) -> List[Dict[str, Any]]:
-    worksheet = spreadsheet.worksheet(worksheet_name)
-    logger.info("[fetch_buttons_from_google] Лист получен: %s", worksheet.title)
-
-    rows = worksheet.get_all_records()
+def _parse_buttons(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     result: List[Dict[str, Any]] = []
     for row in rows:
         key = row.get("key")
@@ -83,14 +78,10 @@ def fetch_buttons_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name:
         if not key or label is None:
             continue
         result.append({"key": key, "label": label})
-    logger.info("[fetch_buttons_from_google] Загружено %d кнопок из Google Sheets", len(result))
+    logger.info("[_parse_buttons] Загружено %d кнопок из Google Sheets", len(result))
     return result
 
-def fetch_users_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: str) -> List[Dict[str, Any]]:
-    worksheet = spreadsheet.worksheet(worksheet_name)
-    logger.info("[fetch_users_from_google] Лист получен: %s", worksheet.title)
-
-    rows = worksheet.get_all_records()
+def _parse_users(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     result: List[Dict[str, Any]] = []
     for row in rows:
         user_id = row.get("user_id")
@@ -108,7 +99,7 @@ def fetch_users_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: st
                     daily_report_draft = literal_eval(raw)
                 except Exception as e:
                     logger.warning(
-                        f"[fetch_users_from_google] Не смогли распарсить черновик пользователя "
+                        f"[_parse_users] Не смогли распарсить черновик пользователя "
                         f"{user_id!r} ни через JSON, ни через AST: {e}"
                     )
                     daily_report_draft = {}
@@ -118,7 +109,7 @@ def fetch_users_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: st
         # и ещё убеждаемся, что это dict
         if not isinstance(daily_report_draft, dict):
             logger.warning(
-                f"[fetch_users_from_google] Некорректный тип черновика у пользователя {user_id}: "
+                f"[_parse_users] Некорректный тип черновика у пользователя {user_id}: "
                 f"{type(daily_report_draft)}"
             )
             daily_report_draft = {}
@@ -131,20 +122,34 @@ def fetch_users_from_google(spreadsheet: gspread.Spreadsheet, worksheet_name: st
             "last_message_id":    row.get("last_message_id") or None,
             "is_workday":         row.get("is_workday") in ("TRUE", "True", True),
             "daily_report_draft": daily_report_draft,
+            "location":           row.get("location") or None,
         }
         result.append(entry)
 
-    logger.info("[fetch_users_from_google] Загружено %d пользователей из Google Sheets", len(result))
+    logger.info("[_parse_users] Загружено %d пользователей из Google Sheets", len(result))
     return result
 
-def report_exists(date: str) -> bool:
-    spreadsheet = _get_spreadsheet(DAILY_REPORT_SHEET_ID)
-    worksheet = spreadsheet.worksheet("reports")
-    values = worksheet.get_all_values()
-    for row in values[1:]:
-        if row and row[0].strip() == date:
-            return True
-    return False
+def fetch_config_from_google(spreadsheet_id: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]],
+                                                         List[Dict[str, Any]]]:
+    """
+    Загружает листы 'states', 'ru_buttons' и 'users' одним запросом values:batchGet.
+    Возвращает (состояния, кнопки, пользователи) в форматах _parse_states, _parse_buttons и _parse_users.
+    """
+    states_values, buttons_values, users_values = values_batch_get(
+        spreadsheet_id, ["states", "ru_buttons", "users"], Priority.BULK
+    )
+    return (
+        _parse_states(_to_records(states_values)),
+        _parse_buttons(_to_records(buttons_values)),
+        _parse_users(_to_records(users_values)),
+    )
+
+def report_exists(date: str, location: str = DEFAULT_LOCATION) -> bool:
+    # отчёт, который ещё ждёт отправки в очереди, тоже считается существующим
+    return lookup_report_row(date, location) is not None or has_pending_report(date, location)
+
+async def report_exists_async(date: str, location: str = DEFAULT_LOCATION) -> bool:
+    return await run_io("google", report_exists, date, location)
 
 async def add_report_to_google(user: User, update: Update, context: ContextTypes.DEFAULT_TYPE):
     def _log_report():
@@ -158,43 +163,22 @@ async def add_report_to_google(user: User, update: Update, context: ContextTypes
             logger.error(f"[add_report_to_google._log_report] Ошибка при записи информации об отчете от пользователя "
                          f"{user.name}({user.user_id}) в лог: {e}")
 
-    text = "<b>📋 Отчёт по смене</b>\n\n⏳ Подожди, сохраняю отчет..."
-    await BotMessage(user=user, chat_id=update.effective_chat.id, text=text, reply_markup=False).edit(context)
-
-    report = user.daily_report_draft
+    report = user.draft.as_dict()
     try:
-        spreadsheet = _get_spreadsheet(DAILY_REPORT_SHEET_ID)
-        worksheet = spreadsheet.worksheet("reports")
-        values = worksheet.get_all_values()
-
-        row_data = [
-            report["date"],
-            report.get("author"),
-            report.get("wolt"),
-            report.get("bolt"),
-            report.get("yandex"),
-            report.get("temp"),
-            report.get("weather_label"),
-            _get_tbilisi_datetime()
-        ]
-
-        if user.daily_report_draft["overwrite"]:
-            for i, row in enumerate(values[1:], start=2):
-                if row and row[0].strip() == report["date"]:
-                    worksheet.update(f"A{i}:H{i}", [row_data])
-        else:
-            worksheet.append_row(row_data)
+        # отчёт сначала надёжно сохраняется локально, в Google Sheets его отправит фоновая задача
+        await run_io("db", enqueue_report, report)
+        context.application.create_task(flush_report_outbox())
 
         _log_report()
-        user.clear_draft()
+        await user.clear_draft()
         logger.info(f"[add_report_to_google] Пользователь {user.name}({user.user_id}) "
                     f"заполнил отчет за {report.get('date')}. Отчет сохранен.")
-        user.set_state("main_menu")
+        await user.set_state("main_menu")
         await update.callback_query.answer("✅ Отчёт сохранён. Спасибо!", show_alert=True)
         # comment = "✅ Отчёт сохранён. Спасибо!\n"
     except Exception as e:
         log_text = (f"[add_report_to_google] Пользователю {user.name}({user.user_id}) "
-                    f"не удалось сохранить отчёт за {user.daily_report_draft['date']}: {e}")
+                    f"не удалось сохранить отчёт за {report['date']}: {e}")
         logger.error(log_text)
         await update.callback_query.answer(f"❌ Не удалось сохранить отчёт. Пожалуйста, отправьте администратору "
                                            f"скриншот данного сообщения: {log_text}",
@@ -205,116 +189,98 @@ async def add_report_to_google(user: User, update: Update, context: ContextTypes
     await BotMessage(user, chat_id=update.effective_chat.id).edit(context)
 
 # === Работа с БД ===
-def upsert_states(states_data: List[Dict[str, Any]]):
+STATE_COLUMNS = ["comment", "phrase_admin", "phrase_manager", "phrase_user",
+                 "buttons_admin", "buttons_manager", "buttons_user"]
+BUTTON_COLUMNS = ["label"]
+# колонки пользователя, которыми распоряжается лист 'users'; state, last_message_id и черновик — живое
+# состояние бота, их синхронизация не трогает (кроме новых пользователей)
+USER_SHEET_COLUMNS = ["name", "role", "is_workday", "location"]
+
+def upsert_states(session: Session, states_data: List[Dict[str, Any]]) -> SyncSummary:
     """
-    Полностью перезаписывает таблицу 'states'.
+    Приводит таблицу 'states' к данным листа, меняя только отличающиеся строки.
     """
-    with SessionLocal.begin() as session:
-        session.execute(delete(State))
+    rows = [{"state_key": entry["state_key"], **{column: entry.get(column) for column in STATE_COLUMNS}}
+            for entry in states_data]
+    return sync_table(session, State, rows, STATE_COLUMNS)
 
-        for entry in states_data:
-            state = State(
-                state_key=entry["state_key"],
-                comment=entry.get("comment"),
-                phrase_admin=entry.get("phrase_admin"),
-                phrase_manager=entry.get("phrase_manager"),
-                phrase_user=entry.get("phrase_user"),
-                buttons_admin=entry.get("buttons_admin"),
-                buttons_manager=entry.get("buttons_manager"),
-                buttons_user=entry.get("buttons_user"),
-            )
-            session.add(state)
-    logger.info("[upsert_states] Таблица 'states' перезаписана")
-
-def upsert_buttons(buttons_data: List[Dict[str, Any]]):
+def upsert_buttons(session: Session, buttons_data: List[Dict[str, Any]]) -> SyncSummary:
     """
-    Полностью перезаписывает таблицу 'ru_buttons'.
+    Приводит таблицу 'ru_buttons' к данным листа, меняя только отличающиеся строки.
     """
-    with SessionLocal.begin() as session:
-        session.execute(delete(Button))
+    rows = [{"key": entry["key"], "label": entry["label"]} for entry in buttons_data]
+    return sync_table(session, Button, rows, BUTTON_COLUMNS)
 
-        for entry in buttons_data:
-            button_obj = Button(key=entry["key"], label=entry["label"])
-            session.add(button_obj)
-    logger.info("[upsert_buttons] Таблица 'ru_buttons' перезаписана")
-
-def upsert_users(states_data: List[Dict[str, Any]]):
+def upsert_users(session: Session, users_data: List[Dict[str, Any]]) -> SyncSummary:
     """
-    Полностью перезаписывает таблицу 'users'.
+    Добавляет новых пользователей из листа, обновляет у существующих только колонки USER_SHEET_COLUMNS
+    и удаляет тех, кого в листе больше нет (так администратор отзывает доступ).
+    Пользователи с невыгруженными изменениями (в том числе только что зарегистрированные — User.create
+    помечает их для выгрузки) не обновляются и не удаляются — иначе лист откатил бы их.
     """
-    with SessionLocal.begin() as session:
-        session.execute(delete(User))
-
-        for entry in states_data:
-            user = User(
-                user_id=entry["user_id"],
-                name=entry.get("name"),
-                role=entry.get("role"),
-                state=entry.get("state"),
-                last_message_id=entry.get("last_message_id"),
-                is_workday=entry.get("is_workday") in ("TRUE", "True"),
-                daily_report_draft=entry.get("daily_report_draft")
-            )
-            session.add(user)
-    logger.info("[upsert_states] Таблица 'users' перезаписана")
+    pending = set(session.scalars(select(User.user_id).where(User.sheet_dirty.isnot(None))))
+    rows = [
+        {
+            "user_id": entry["user_id"],
+            "name": entry.get("name"),
+            "role": entry.get("role"),
+            "state": entry.get("state"),
+            "last_message_id": entry.get("last_message_id"),
+            "is_workday": bool(entry.get("is_workday")),
+            "daily_report_draft": entry.get("daily_report_draft"),
+            "location": entry.get("location")
+        }
+        for entry in users_data
+        if entry["user_id"] not in pending
+    ]
+    return sync_table(session, User, rows, USER_SHEET_COLUMNS, keep=pending)
 
-def update_from_google_to_db():
+def update_from_google_to_db() -> List[SyncSummary]:
+    started = time.perf_counter()
     init_db()
-    spreadsheet = _get_spreadsheet(BOT_CONFIG_SHEET_ID)
-    states_data = fetch_states_from_google(spreadsheet, "states")
-    upsert_states(states_data)
-    buttons_data = fetch_buttons_from_google(spreadsheet, "ru_buttons")
-    upsert_buttons(buttons_data)
-    users_data = fetch_users_from_google(spreadsheet, "users")
-    upsert_users(users_data)
-    logger.info("[update_from_google_to_db] Синхронизация завершена")
-
-def rewrite_users_on_google_from_db():
+    states_data, buttons_data, users_data = fetch_config_from_google(BOT_CONFIG_SHEET_ID)
+    fetched = time.perf_counter()
+    # снимок собирается и проверяется до записи в БД: некорректная конфигурация не попадёт ни в БД,
+    # ни на экраны пользователей (ConfigError), а отрисовка до подмены работает со старым снимком
+    try:
+        snapshot = build_snapshot(states_data, buttons_data)
+    except ConfigError:
+        # лист 'users' от экранов не зависит: отзыв доступа и смена ролей применяются и при отклонённой конфигурации
+        with SessionLocal.begin() as session:
+            summary = upsert_users(session, users_data)
+        invalidate_user_cache()
+        logger.info(f"[update_from_google_to_db] Конфигурация экранов не применена, пользователи синхронизированы: "
+                    f"{summary}")
+        raise
+    with SessionLocal.begin() as session:
+        summaries = [
+            upsert_states(session, states_data),
+            upsert_buttons(session, buttons_data),
+            upsert_users(session, users_data),
+        ]
+    # роли, рабочие дни и точки могли поменяться — кэш пользователей перечитается из БД
+    invalidate_user_cache()
+    install_snapshot(snapshot)
+    logger.info(f"[update_from_google_to_db] Синхронизация завершена за {time.perf_counter() - started:.2f} с "
+                f"(загрузка из Google Sheets: {fetched - started:.2f} с): "
+                + ", ".join(str(summary) for summary in summaries))
+    return summaries
+
+async def reload_config() -> List[SyncSummary]:
     """
-    Перезаписывает лист 'users' в Google Sheets данными из таблицы User в БД.
+    Перечитывает конфигурацию из Google Sheets в пуле потоков, не блокируя цикл событий.
+    Одновременно выполняется только одна перезагрузка.
     """
-    # 1. Открываем Google Spreadsheet и лист
-    spreadsheet = _get_spreadsheet(BOT_CONFIG_SHEET_ID)
-    worksheet = spreadsheet.worksheet("users")
-
-    # 2. Читаем всех пользователей из БД и сразу упаковываем в list of dict
-    users_data = []
-    with SessionLocal() as session:
-        db_users = session.query(User).all()
-        for u in db_users:
-            users_data.append({
-                "user_id":            u.user_id,
-                "name":               u.name or "",
-                "role":               u.role or "",
-                "state":              u.state or "",
-                "last_message_id":    u.last_message_id or "",
-                "is_workday":         "TRUE" if u.is_workday else "FALSE",
-                "daily_report_draft": json.dumps(u.daily_report_draft or {}, ensure_ascii=False)
-            })
-
-    # 3. Собираем строки для Google Sheets
-    header = [
-        "user_id",
-        "name",
-        "role",
-        "state",
-        "last_message_id",
-        "is_workday",
-        "daily_report_draft"
-    ]
-    rows = [header]
-    for entry in users_data:
-        rows.append([
-            entry["user_id"],
-            entry["name"],
-            entry["role"],
-            entry["state"],
-            entry["last_message_id"],
-            entry["is_workday"],
-            entry["daily_report_draft"],
-        ])
+    async with _reload_lock:
+        return await run_io("google_bulk", update_from_google_to_db)
 
-    # 4. Публикуем в Google Sheets
-    worksheet.clear()
-    worksheet.update(rows)
-    logger.info("[rewrite_users_on_google_from_db] Лист 'users' перезаписан данными из БД")
+async def reload_config_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Периодическая задача: подхватывает правки листов 'states', 'ru_buttons' и 'users' без перезапуска.
+    """
+    try:
+        await reload_config()
+    except ConfigError as e:
+        logger.error(f"[reload_config_job] Конфигурация не применена, бот работает на прежней: {e}")
+    except Exception as e:
+        logger.error(f"[reload_config_job] Не удалось перечитать конфигурацию из Google Sheets: {e}")
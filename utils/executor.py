@@ -0,0 +1,39 @@
+import asyncio
+import functools
+import logging
+import utils.logger # noqa: F401
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from config import IO_MAX_WORKERS, IO_BACKEND_LIMITS
+
+logger = logging.getLogger(__name__)
+
+# Общий ограниченный пул потоков для блокирующего I/O, чтобы медленный запрос к Google
+# не останавливал цикл событий python-telegram-bot и не задерживал остальных пользователей.
+_executor = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix="io")
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _get_semaphore(backend: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(backend)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(IO_BACKEND_LIMITS.get(backend, IO_MAX_WORKERS))
+        _semaphores[backend] = semaphore
+    return semaphore
+
+
+async def run_io(backend: str, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Выполняет блокирующую функцию в пуле потоков, не занимая цикл событий.
+    Одновременно для одного бэкенда ('google', 'weather', ...) выполняется не больше IO_BACKEND_LIMITS[backend]
+    вызовов, остальные ждут своей очереди.
+    """
+    async with _get_semaphore(backend):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    logger.info("[shutdown_executor] Пул потоков для I/O остановлен")
@@ -0,0 +1,100 @@
+import logging
+import threading
+import utils.logger # noqa: F401
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import CREDS_FILE_PATH, GOOGLE_API_TIMEOUT
+from utils.sheets_quota import sheets_call, Priority
+
+if TYPE_CHECKING:
+    import gspread
+
+logger = logging.getLogger(__name__)
+
+# Один клиент на процесс: внутри него AuthorizedSession (общий пул HTTP-соединений),
+# которая обновляет токен только когда он истёк.
+# gspread и google-auth (вместе с requests) импортируются при первом обращении, а не при старте бота.
+_client: Optional["gspread.Client"] = None
+_spreadsheets: Dict[str, "gspread.Spreadsheet"] = {}
+_worksheets: Dict[Tuple[str, str], "gspread.Worksheet"] = {}
+_lock = threading.RLock()
+
+
+def _get_client() -> "gspread.Client":
+    global _client
+    with _lock:
+        if _client is None:
+            import gspread
+            from google.oauth2.service_account import Credentials
+
+            logger.info("[_get_client] Авторизация по service account...")
+            creds = Credentials.from_service_account_file(
+                CREDS_FILE_PATH,
+                scopes=["https://www.googleapis.com/auth/spreadsheets"]
+            )
+            _client = gspread.authorize(creds)
+            _client.set_timeout(GOOGLE_API_TIMEOUT)
+        return _client
+
+
+def get_spreadsheet(spreadsheet_id: str) -> "gspread.Spreadsheet":
+    """
+    Возвращает закэшированную таблицу по её ID, открывая её при первом обращении.
+    Запрос идёт без блокировки: ожидание квоты не задерживает обращения к кэшу из других потоков.
+    """
+    with _lock:
+        spreadsheet = _spreadsheets.get(spreadsheet_id)
+    if spreadsheet is not None:
+        return spreadsheet
+    try:
+        spreadsheet = sheets_call(Priority.INTERACTIVE, _get_client().open_by_key, spreadsheet_id)
+    except Exception as e:
+        logger.error("[get_spreadsheet] Не удалось получить таблицу %s: %s", spreadsheet_id, e)
+        raise
+    with _lock:
+        # таблицу мог открыть другой поток, пока шёл запрос — оставляем ту, что уже в кэше
+        return _spreadsheets.setdefault(spreadsheet_id, spreadsheet)
+
+
+def get_worksheet(spreadsheet_id: str, title: str) -> "gspread.Worksheet":
+    """
+    Возвращает закэшированный лист таблицы, запрашивая метаданные только при первом обращении.
+    """
+    with _lock:
+        worksheet = _worksheets.get((spreadsheet_id, title))
+    if worksheet is not None:
+        return worksheet
+    try:
+        worksheet = sheets_call(Priority.INTERACTIVE, get_spreadsheet(spreadsheet_id).worksheet, title)
+    except Exception as e:
+        logger.error("[get_worksheet] Не удалось получить лист '%s' таблицы %s: %s", title, spreadsheet_id, e)
+        raise
+    with _lock:
+        return _worksheets.setdefault((spreadsheet_id, title), worksheet)
+
+
+def values_batch_get(spreadsheet_id: str, ranges: List[str], priority: Priority) -> List[List[List[str]]]:
+    """
+    Читает несколько диапазонов (например, целые листы по их названиям) одним запросом values:batchGet.
+    В отличие от get_spreadsheet/get_worksheet не запрашивает метаданные таблицы.
+    Возвращает значения каждого диапазона в порядке ranges (пустой диапазон — пустой список).
+    """
+    from gspread.urls import SPREADSHEET_VALUES_BATCH_URL
+
+    response = sheets_call(priority, _get_client().request, "get", SPREADSHEET_VALUES_BATCH_URL % spreadsheet_id,
+                           params={"ranges": ranges})
+    return [value_range.get("values", []) for value_range in response.json().get("valueRanges", [])]
+
+
+def reset_google_client() -> None:
+    """
+    Сбрасывает клиента и все закэшированные таблицы и листы. Вызывается планировщиком квоты после ошибки
+    авторизации или соединения (utils.sheets_quota): следующее обращение заново авторизуется
+    и откроет новую HTTP-сессию.
+    """
+    global _client
+    with _lock:
+        _client = None
+        _spreadsheets.clear()
+        _worksheets.clear()
+    logger.info("[reset_google_client] Кэш клиента Google Sheets сброшен")
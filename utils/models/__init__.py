@@ -1,6 +1,11 @@
-from .base import Base, SessionLocal, engine, init_db
+from .base import Base, SessionLocal, AsyncSessionLocal, engine, async_engine, init_db
 from .state import State
 from .button import Button
 from .user import User
+from .weather_cache import WeatherCache
+from .report_index import ReportIndex
+from .report_outbox import ReportOutbox
+from .report_draft import ReportDraft
 
-__all__ = ["Base", "SessionLocal", "engine", "init_db", "State", "Button", "User"]
+__all__ = ["Base", "SessionLocal", "AsyncSessionLocal", "engine", "async_engine", "init_db", "State", "Button", "User",
+           "WeatherCache", "ReportIndex", "ReportOutbox", "ReportDraft"]
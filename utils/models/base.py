@@ -1,8 +1,9 @@
 import logging
 import utils.logger # noqa: F401
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
-from config import DATABASE_PATH
+from config import DATABASE_PATH, SQLITE_PRAGMAS, DB_POOL_SIZE, DB_MAX_OVERFLOW
 
 
 logger = logging.getLogger(__name__)
@@ -10,9 +11,51 @@ logger = logging.getLogger(__name__)
 class Base(DeclarativeBase):
     pass
 
-engine = create_engine(DATABASE_PATH, echo=False)
+
+def _async_url(url: str) -> str:
+    # тот же файл БД, но через драйвер aiosqlite
+    return url.replace("sqlite://", "sqlite+aiosqlite://", 1) if url.startswith("sqlite://") else url
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+# Синхронный движок — для фоновых потоков (синхронизация с Google Sheets, очереди выгрузки),
+# асинхронный — для обработчиков: ожидание записи не останавливает цикл событий.
+engine = create_engine(DATABASE_PATH, echo=False, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+async_engine = create_async_engine(_async_url(DATABASE_PATH), echo=False, pool_size=DB_POOL_SIZE,
+                                   max_overflow=DB_MAX_OVERFLOW)
+event.listen(engine, "connect", _set_sqlite_pragmas)
+event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
 SessionLocal = sessionmaker(bind=engine, future=True, autoflush=False, autocommit=False)
+# expire_on_commit=False: объекты (например, User) остаются читаемыми после выхода из сессии
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+def _add_missing_columns():
+    """
+    create_all не добавляет новые колонки в уже существующие таблицы — добавляем недостающие nullable-колонки сами.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable:
+                    logger.error(f"[init_db] Не могу добавить NOT NULL колонку '{column.name}' в таблицу "
+                                 f"'{table.name}' — нужна ручная миграция")
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                logger.info(f"[init_db] В таблицу '{table.name}' добавлена колонка '{column.name}'")
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
     logger.info("[init_db] Все таблицы созданы (если не существовали)")
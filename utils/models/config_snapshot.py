@@ -0,0 +1,155 @@
+import json
+import logging
+import utils.logger # noqa: F401
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from utils.models.base import SessionLocal
+from utils.models.button import Button
+from utils.models.state import State
+from utils.models.templates import ROLES, PhraseTemplate, TemplateError
+
+logger = logging.getLogger(__name__)
+
+STATE_FIELDS = ("comment", "phrase_admin", "phrase_manager", "phrase_user",
+                "buttons_admin", "buttons_manager", "buttons_user")
+
+
+class ConfigError(ValueError):
+    """
+    Конфигурация из листов 'states' и 'ru_buttons' некорректна и не может быть применена.
+    """
+
+
+@dataclass(frozen=True)
+class RenderEntry:
+    """
+    Готовые к отрисовке данные экрана для пары (state_key, role):
+      - template : скомпилированная фраза из таблицы 'states' (None, если не задана или некорректна)
+      - keyboard : собранная клавиатура с подставленными подписями кнопок (None, если кнопки не заданы)
+    """
+    template: Optional[PhraseTemplate]
+    keyboard: Optional[InlineKeyboardMarkup]
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Неизменяемый снимок конфигурации бота. Собирается целиком и подменяет предыдущий одним присваиванием,
+    поэтому отрисовка никогда не видит наполовину обновлённую конфигурацию.
+      - states   : state_key → поля строки листа 'states'
+      - labels   : ключ кнопки → подпись
+      - entries  : (state_key, role) → RenderEntry
+      - built_at : когда снимок собран
+    """
+    states: Mapping[str, Mapping[str, Any]]
+    labels: Mapping[str, str]
+    entries: Mapping[Tuple[str, str], RenderEntry]
+    built_at: datetime
+
+
+_snapshot: Optional[ConfigSnapshot] = None
+
+
+def _build_keyboard(state_key: str, role: str, raw_buttons: Optional[str], labels: Mapping[str, str],
+                    errors: List[str], warnings: List[str]) -> Optional[InlineKeyboardMarkup]:
+    if not raw_buttons:
+        return None
+    try:
+        buttons_list = json.loads(raw_buttons)
+    except Exception as e:
+        errors.append(f"'{state_key}'/{role}: не удалось распарсить кнопки '{raw_buttons}': {e}")
+        return None
+
+    keyboard = []
+    for row in buttons_list:
+        keyboard_row = []
+        for key in row:
+            label = labels.get(key)
+            if label is None:
+                label = f"❓{key}"
+                warnings.append(f"'{state_key}'/{role}: не найдена кнопка с ключом '{key}'")
+            keyboard_row.append(InlineKeyboardButton(text=label, callback_data=key))
+        keyboard.append(keyboard_row)
+    return InlineKeyboardMarkup(keyboard)
+
+
+def _compile_phrase(state_key: str, role: str, phrase: Optional[str], errors: List[str]) -> Optional[PhraseTemplate]:
+    if phrase is None:
+        return None
+    try:
+        return PhraseTemplate(str(phrase))
+    except TemplateError as e:
+        errors.append(f"'{state_key}'/{role}: {e}")
+        return None
+
+
+def build_snapshot(states_data: List[Dict[str, Any]], buttons_data: List[Dict[str, Any]],
+                   strict: bool = True) -> ConfigSnapshot:
+    """
+    Собирает снимок конфигурации из строк листов 'states' и 'ru_buttons' (в форматах fetch_config_from_google).
+    strict=True — при ошибке в фразе (синтаксис, неизвестный плейсхолдер) или в JSON кнопок выбрасывает ConfigError
+    со списком всех ошибок; strict=False — только логирует их, а проблемные экраны отрисовываются как раньше.
+    Кнопка с неизвестным ключом не ошибка: она отрисовывается как «❓ключ», а в лог пишется предупреждение.
+    """
+    labels = MappingProxyType({entry["key"]: str(entry["label"]) for entry in buttons_data})
+    states = {}
+    entries = {}
+    errors: List[str] = []
+    warnings: List[str] = []
+    for entry in states_data:
+        state_key = entry["state_key"]
+        states[state_key] = MappingProxyType({field: entry.get(field) for field in STATE_FIELDS})
+        for role in ROLES:
+            entries[(state_key, role)] = RenderEntry(
+                template=_compile_phrase(state_key, role, entry.get(f"phrase_{role}"), errors),
+                keyboard=_build_keyboard(state_key, role, entry.get(f"buttons_{role}"), labels, errors, warnings),
+            )
+    for warning in warnings:
+        logger.warning(f"[build_snapshot] {warning}")
+    if errors:
+        if strict:
+            raise ConfigError("Некорректная конфигурация в листах 'states'/'ru_buttons': " + "; ".join(errors))
+        for error in errors:
+            logger.error(f"[build_snapshot] {error}")
+
+    return ConfigSnapshot(
+        states=MappingProxyType(states),
+        labels=labels,
+        entries=MappingProxyType(entries),
+        built_at=datetime.now(),
+    )
+
+
+def build_snapshot_from_db() -> ConfigSnapshot:
+    """
+    Собирает снимок из таблиц 'states' и 'ru_buttons' локальной БД (ошибки только логируются).
+    """
+    with SessionLocal() as session:
+        states_data = [{"state_key": state.state_key, **{field: getattr(state, field) for field in STATE_FIELDS}}
+                       for state in session.query(State).all()]
+        buttons_data = [{"key": button.key, "label": button.label} for button in session.query(Button).all()]
+    return build_snapshot(states_data, buttons_data, strict=False)
+
+
+def install_snapshot(snapshot: ConfigSnapshot) -> None:
+    global _snapshot
+    _snapshot = snapshot
+    logger.info(f"[install_snapshot] Применён снимок конфигурации: {len(snapshot.states)} состояний, "
+                f"{len(snapshot.labels)} кнопок")
+
+
+def get_snapshot() -> ConfigSnapshot:
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = build_snapshot_from_db()
+        install_snapshot(snapshot)
+    return snapshot
+
+
+def get_render_entry(state_key: str, role: str) -> Optional[RenderEntry]:
+    return get_snapshot().entries.get((state_key, role))
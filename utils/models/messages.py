@@ -1,22 +1,34 @@
 from telegram.error import BadRequest
 
-from utils.models import Button
-from telegram import InlineKeyboardButton
+import asyncio
+import hashlib
 import logging
 import utils.logger # noqa: F401
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Awaitable, Optional, Tuple
 
 from telegram import InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from utils.models.base import SessionLocal
-from utils.models.state import State
+from config import TELEGRAM_PLACEHOLDER_DELAY_SECONDS, USER_CACHE_SIZE
+from utils.models.config_snapshot import get_render_entry
 from utils.models.user import User
-import json
+from utils.telegram_outbound import outbound
 
 logger = logging.getLogger(__name__)
 
+# что сейчас показано в сообщении пользователя: user_id → (message_id, отпечаток текста, клавиатуры и parse_mode).
+# LRU того же размера, что и кэш пользователей: для вытесненного пользователя первая правка просто уйдёт в Telegram
+_rendered: "OrderedDict[int, Tuple[int, str]]" = OrderedDict()
+
+
+def _remember_rendered(user_id: int, message_id: int, fingerprint: str) -> None:
+    _rendered[user_id] = (message_id, fingerprint)
+    _rendered.move_to_end(user_id)
+    while len(_rendered) > USER_CACHE_SIZE:
+        _rendered.popitem(last=False)
+
 @dataclass
 class BotMessage:
     user: User
@@ -29,79 +41,26 @@ class BotMessage:
 
     def __post_init__(self):
         def _build_text()-> str | None:
-            text = None
-            if role == "admin":
-                text = state.phrase_admin
-            elif role == "manager":
-                text = state.phrase_manager
-            elif role == "user":
-                text = state.phrase_user
-            if text is None:
+            template = entry.template if entry else None
+            if template is None:
                 logger.error(f"[_build_text] Текст для состояния '{state_key}' и роли '{role}' пустой.")
-                text = ""
-
-            text = text.replace(r'\n', '\n')
-            placeholders = {
-                "name": self.user.name or "",
-                "id": str(self.user.user_id),
-                "role": self.user.role,
-                "comment": self.comment if self.comment else "",
-                "daily_report_date": self.user.daily_report_draft["date"],
-                "wolt": self.user.daily_report_draft["wolt"],
-                "bolt": self.user.daily_report_draft["bolt"],
-                "yandex": self.user.daily_report_draft["yandex"],
-                "daily_report_temp": self.user.daily_report_draft["temp"],
-                "daily_report_weather_label": self.user.daily_report_draft["weather_label"]
-                # Добавляй сюда другие переменные по мере необходимости
-            }
-            try:
-                text = text.format(**placeholders)
-            except KeyError as e:
-                logger.warning(f"[BotMessage._format_placeholders] Не удалось заменить плейсхолдер: {e}")
-            return text
+                return ""
+            return template.render(self.user, self.comment)
 
         def _build_keyboard() -> InlineKeyboardMarkup | None:
             if self.reply_markup is False:
                 return None
 
-            raw_buttons = None
-            if role == "admin":
-                raw_buttons = state.buttons_admin
-            elif role == "manager":
-                raw_buttons = state.buttons_manager
-            elif role == "user":
-                raw_buttons = state.buttons_user
-
-            if not raw_buttons:
+            keyboard = entry.keyboard if entry else None
+            if keyboard is None:
                 logger.error(f"[_build_keyboard] Кнопки для состояния '{state_key}' и роли '{role}' не заданы.")
-                return None
-            else:
-                buttons_from_db = session.query(Button).all()
-                labels = {btn.key: btn.label for btn in buttons_from_db}
-                try:
-                    buttons_list = json.loads(raw_buttons)
-                except Exception as e:
-                    logger.error(f"[build_keyboard] Не удалось распарсить JSON '{raw_buttons}': {e}")
-                    return None
-                keyboard = []
-                for row_index, row in enumerate(buttons_list):
-                    keyboard_row = []
-                    for key in row:
-                        label = labels.get(key)
-                        if label is None:
-                            label = f"❓{key}"
-                            logger.warning(f"[build_keyboard] Не найдена кнопка с ключом '{key}' в БД")
-                        keyboard_row.append(InlineKeyboardButton(text=label, callback_data=key))
-                    keyboard.append(keyboard_row)
-                return InlineKeyboardMarkup(keyboard)
+            return keyboard
 
         state_key = self.user.state
         role = self.user.role
 
-        session = SessionLocal()
-
         try:
-            state = session.query(State).filter(State.state_key == state_key).first()
+            entry = get_render_entry(state_key, role)
 
             if not self.text:
                 self.text = _build_text()
@@ -111,8 +70,10 @@ class BotMessage:
 
         except Exception as e:
             logger.exception(f"[BotMessage] Ошибка в __post_init__ для user_id={self.user.user_id}: {e}")
-        finally:
-            session.close()
+
+    def _fingerprint(self) -> str:
+        markup = self.reply_markup.to_json() if isinstance(self.reply_markup, InlineKeyboardMarkup) else ""
+        return hashlib.sha1(f"{self.parse_mode}\0{self.text or ''}\0{markup}".encode("utf-8")).hexdigest()
 
     async def send(self, context: ContextTypes.DEFAULT_TYPE):
         try:
@@ -128,13 +89,19 @@ class BotMessage:
                 f"user_id={self.user.user_id}, message_id={self.user.last_message_id}: {e}"
             )
         try:
-            self.user.set_last_message_id(msg.message_id)
+            _remember_rendered(self.user.user_id, msg.message_id, self._fingerprint())
+            await self.user.set_last_message_id(msg.message_id)
         except Exception as e:
             logger.error(f"[BotMessage.send] Не удалось сохранить last_message_id: {e}")
 
     async def edit(self, context: ContextTypes.DEFAULT_TYPE):
         last_msg_id = self.user.last_message_id
         if last_msg_id:
+            fingerprint = self._fingerprint()
+            if _rendered.get(self.user.user_id) == (last_msg_id, fingerprint):
+                # сообщение уже показывает ровно это — запрос к Telegram не нужен
+                outbound.record_skipped()
+                return
             try:
                 await context.bot.edit_message_text(
                     chat_id=self.chat_id,
@@ -143,9 +110,10 @@ class BotMessage:
                     reply_markup=self.reply_markup,
                     parse_mode=self.parse_mode
                 )
+                _remember_rendered(self.user.user_id, last_msg_id, fingerprint)
             except BadRequest as e:
                 if "Message is not modified" in str(e):
-                    pass  # просто пропускаем
+                    _remember_rendered(self.user.user_id, last_msg_id, fingerprint)
                 else:
                     logger.warning(
                         f"[BotMessage.edit] Ошибка BadRequest при редактировании сообщения (message_id={last_msg_id}) "
@@ -160,3 +128,18 @@ class BotMessage:
                 await self.send(context)
         else:
             await self.send(context)
+
+    async def edit_while(self, context: ContextTypes.DEFAULT_TYPE, awaitable: Awaitable[Any],
+                         delay: float = TELEGRAM_PLACEHOLDER_DELAY_SECONDS) -> Any:
+        """
+        Показывает это сообщение как промежуточный экран, пока выполняется awaitable (например, загрузка погоды),
+        и возвращает её результат. Если результат готов за delay секунд, промежуточная правка не отправляется:
+        сразу за ней последовала бы итоговая, и Telegram получает только её.
+        """
+        task = asyncio.ensure_future(awaitable)
+        done, _ = await asyncio.wait({task}, timeout=delay)
+        if done:
+            outbound.record_coalesced()
+        else:
+            await self.edit(context)
+        return await task
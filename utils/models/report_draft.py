@@ -0,0 +1,161 @@
+import logging
+import weakref
+import utils.logger # noqa: F401
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, String, inspect
+
+from utils.models.base import Base, AsyncSessionLocal
+from utils.models.unit_of_work import current_unit_of_work
+
+logger = logging.getLogger(__name__)
+
+DRAFT_FIELDS = ("date", "author", "wolt", "bolt", "yandex", "temp", "weather_label", "location", "overwrite")
+# поля, которые clear_draft возвращает к значениям по умолчанию (автор остаётся)
+RESET_FIELDS = {"date": None, "wolt": None, "bolt": None, "yandex": None, "temp": None, "weather_label": None,
+                "location": None, "overwrite": False}
+
+# Черновики активных пользователей живут в памяти: правка поля меняет только объект, а в БД изменённые колонки
+# попадают на контрольной точке (смена состояния пользователя, завершение работы бота).
+# Черновик держит объект пользователя (User.draft), поэтому он живёт, пока пользователь в кэше или его обновление
+# ещё обрабатывается, — словарь ссылается на него слабо. Черновики с несохранёнными правками держит _unsaved,
+# пока они не попадут в БД.
+_drafts: "weakref.WeakValueDictionary[int, ReportDraft]" = weakref.WeakValueDictionary()
+_unsaved: Dict[int, "ReportDraft"] = {}
+
+
+class ReportDraft(Base):
+    """
+    ORM-модель для таблицы 'report_drafts' — черновики отчётов по смене, по одному на пользователя.
+    Поля:
+      - user_id       : PK INTEGER
+      - date          : VARCHAR, nullable — дата отчёта (ДД.ММ.ГГГГ)
+      - author        : VARCHAR, nullable — «Имя(user_id)» автора
+      - wolt          : FLOAT, nullable — выручка Wolt
+      - bolt          : FLOAT, nullable — выручка Bolt
+      - yandex        : FLOAT, nullable — выручка Яндекс
+      - temp          : FLOAT, nullable — температура воздуха
+      - weather_label : VARCHAR, nullable — погодные условия
+      - location      : VARCHAR, nullable — ключ точки продаж из config.LOCATIONS
+      - overwrite     : BOOLEAN, not null — перезаписать существующий отчёт за эту дату
+      - updated_at    : DATETIME, nullable — когда черновик менялся в последний раз
+    """
+    __tablename__ = "report_drafts"
+
+    user_id       = Column(Integer, primary_key=True)
+    date          = Column(String, nullable=True)
+    author        = Column(String, nullable=True)
+    wolt          = Column(Float, nullable=True)
+    bolt          = Column(Float, nullable=True)
+    yandex        = Column(Float, nullable=True)
+    temp          = Column(Float, nullable=True)
+    weather_label = Column(String, nullable=True)
+    location      = Column(String, nullable=True)
+    overwrite     = Column(Boolean, nullable=False, default=False)
+    updated_at    = Column(DateTime, nullable=True)
+
+    def update(self, **values: Any) -> None:
+        """
+        Меняет поля черновика в памяти. SQLAlchemy запоминает, какие колонки изменились, — на контрольной точке
+        в БД запишутся только они.
+        """
+        unknown = set(values) - set(DRAFT_FIELDS)
+        if unknown:
+            raise ValueError(f"Неизвестные поля черновика: {', '.join(sorted(unknown))}")
+        changed = False
+        for field, value in values.items():
+            if getattr(self, field) != value:
+                setattr(self, field, value)
+                changed = True
+        if changed:
+            self.updated_at = datetime.now()
+            _unsaved[self.user_id] = self
+
+    def reset(self) -> None:
+        self.update(**RESET_FIELDS)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {field: getattr(self, field) for field in DRAFT_FIELDS}
+
+    @property
+    def has_changes(self) -> bool:
+        state = inspect(self)
+        return state.transient or state.modified
+
+
+def _from_legacy(user_id: int, legacy: Optional[dict]) -> ReportDraft:
+    # черновик, который до появления 'report_drafts' хранился JSON-ом в users.daily_report_draft
+    legacy = legacy or {}
+    draft = ReportDraft(user_id=user_id, overwrite=False)
+    draft.update(**{field: legacy[field] for field in DRAFT_FIELDS if legacy.get(field) is not None})
+    return draft
+
+
+async def load_draft(user_id: int, legacy: Optional[dict] = None) -> ReportDraft:
+    """
+    Возвращает черновик пользователя из памяти, при первом обращении — из таблицы 'report_drafts'.
+    Если там его ещё нет, черновик переносится из legacy (прежний JSON из users.daily_report_draft).
+    """
+    draft = _drafts.get(user_id)
+    if draft is not None:
+        return draft
+    async with AsyncSessionLocal() as session:
+        draft = await session.get(ReportDraft, user_id)
+    if draft is None:
+        draft = _from_legacy(user_id, legacy)
+    return _drafts.setdefault(user_id, draft)
+
+
+def _saved(draft: ReportDraft) -> None:
+    if _unsaved.get(draft.user_id) is draft:
+        del _unsaved[draft.user_id]
+
+
+def _discard(user_id: int, error: BaseException) -> None:
+    # после неудачного коммита атрибуты объекта сброшены — следующий load_draft перечитает последнюю точку
+    _drafts.pop(user_id, None)
+    _unsaved.pop(user_id, None)
+    logger.error(f"[checkpoint_draft] Ошибка при сохранении черновика пользователя {user_id}: {error}",
+                 exc_info=error)
+
+
+async def checkpoint_draft(user_id: int) -> None:
+    """
+    Сохраняет изменённые поля черновика. Во время обработки обновления — в общем коммите единицы работы.
+    """
+    draft = _drafts.get(user_id)
+    if draft is None or not draft.has_changes:
+        return
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.add(user_id, draft, on_commit=lambda: _saved(draft), on_rollback=lambda error: _discard(user_id, error))
+        return
+    try:
+        async with AsyncSessionLocal.begin() as session:
+            session.add(draft)
+    except Exception as e:
+        _discard(user_id, e)
+        return
+    _saved(draft)
+
+
+async def checkpoint_drafts() -> None:
+    """
+    Сохраняет все изменённые черновики одной транзакцией (при завершении работы бота).
+    """
+    changed = {user_id: draft for user_id, draft in list(_unsaved.items()) if draft.has_changes}
+    if not changed:
+        return
+    try:
+        async with AsyncSessionLocal.begin() as session:
+            session.add_all(changed.values())
+        logger.info(f"[checkpoint_drafts] Сохранено черновиков: {len(changed)}")
+    except Exception as e:
+        for user_id in changed:
+            _drafts.pop(user_id, None)
+            _unsaved.pop(user_id, None)
+        logger.exception(f"[checkpoint_drafts] Ошибка при сохранении черновиков: {e}")
+        return
+    for draft in changed.values():
+        _saved(draft)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String
+from utils.models.base import Base
+
+class ReportIndex(Base):
+    """
+    ORM-модель для таблицы 'report_index' — локальная копия расположения отчётов в листе 'reports'.
+    Поля:
+      - date       : PK VARCHAR, дата отчёта в формате ДД.ММ.ГГГГ (колонка A)
+      - location   : PK VARCHAR, точка продаж (колонка I, пустая — точка по умолчанию)
+      - row_number : INTEGER, not null — номер строки в листе
+    """
+    __tablename__ = "report_index"
+
+    date       = Column(String, primary_key=True)
+    location   = Column(String, primary_key=True)
+    row_number = Column(Integer, nullable=False)
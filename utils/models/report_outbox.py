@@ -0,0 +1,28 @@
+from sqlalchemy import Boolean, Column, DateTime, Integer, JSON, String, Text
+from utils.models.base import Base
+
+class ReportOutbox(Base):
+    """
+    ORM-модель для таблицы 'report_outbox' — отчёты, сохранённые локально и ещё не записанные в лист 'reports'.
+    Поля:
+      - id              : PK INTEGER
+      - date            : VARCHAR, not null — дата отчёта (ДД.ММ.ГГГГ)
+      - location        : VARCHAR, not null — точка продаж
+      - row_data        : JSON, not null — строка для листа 'reports' (колонки A–I)
+      - overwrite       : BOOLEAN, not null — перезаписать существующий отчёт, а не добавить новый
+      - created_at      : DATETIME, not null
+      - attempts        : INTEGER, not null — сколько раз не удалось записать
+      - next_attempt_at : DATETIME, not null — раньше этого времени повторно не пытаемся
+      - last_error      : TEXT, nullable
+    """
+    __tablename__ = "report_outbox"
+
+    id              = Column(Integer, primary_key=True, autoincrement=True)
+    date            = Column(String, nullable=False, index=True)
+    location        = Column(String, nullable=False)
+    row_data        = Column(JSON, nullable=False)
+    overwrite       = Column(Boolean, nullable=False, default=False)
+    created_at      = Column(DateTime, nullable=False)
+    attempts        = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error      = Column(Text, nullable=True)
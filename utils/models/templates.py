@@ -0,0 +1,83 @@
+import logging
+import utils.logger # noqa: F401
+from string import Formatter
+from typing import Any, Callable, Dict, FrozenSet
+
+from utils.models.user import User
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("admin", "manager", "user")
+
+
+class TemplateError(ValueError):
+    """
+    Фраза из таблицы 'states' не может быть скомпилирована в шаблон.
+    """
+
+
+def _draft_field(key: str) -> Callable[[User, str], Any]:
+    return lambda user, comment: getattr(user.draft, key)
+
+
+# Фиксированная схема плейсхолдеров: имя → функция, достающая значение из пользователя и комментария.
+# Добавляй сюда другие переменные по мере необходимости
+PLACEHOLDERS: Dict[str, Callable[[User, str], Any]] = {
+    "name": lambda user, comment: user.name or "",
+    "id": lambda user, comment: str(user.user_id),
+    "user_id": lambda user, comment: str(user.user_id),
+    "role": lambda user, comment: user.role,
+    "comment": lambda user, comment: comment or "",
+    "daily_report_date": _draft_field("date"),
+    "wolt": _draft_field("wolt"),
+    "bolt": _draft_field("bolt"),
+    "yandex": _draft_field("yandex"),
+    "daily_report_temp": _draft_field("temp"),
+    "daily_report_weather_label": _draft_field("weather_label"),
+}
+
+
+class PhraseTemplate:
+    """
+    Скомпилированная фраза: переводы строк уже развёрнуты, а набор нужных плейсхолдеров известен заранее.
+    """
+    __slots__ = ("text", "fields")
+
+    def __init__(self, source: str):
+        self.text = source.replace(r'\n', '\n')
+        self.fields: FrozenSet[str] = self._parse_fields(self.text)
+        if not self.fields:
+            # фраза без плейсхолдеров: сразу разворачиваем экранированные скобки '{{' и '}}'
+            self.text = self.text.format()
+
+    @staticmethod
+    def _parse_fields(text: str) -> FrozenSet[str]:
+        fields = set()
+        try:
+            for _, field_name, format_spec, _ in Formatter().parse(text):
+                if field_name is None:
+                    continue
+                # вложенные плейсхолдеры в спецификации формата ({x:{y}}) не поддерживаем
+                if format_spec and "{" in format_spec:
+                    raise TemplateError(f"вложенный плейсхолдер в '{{{field_name}:{format_spec}}}'")
+                name = field_name.split(".", 1)[0].split("[", 1)[0]
+                if not name or name.isdigit():
+                    raise TemplateError("позиционные плейсхолдеры ('{}', '{0}') не поддерживаются")
+                if name not in PLACEHOLDERS:
+                    raise TemplateError(f"неизвестный плейсхолдер '{{{name}}}'")
+                fields.add(name)
+        except ValueError as e:
+            if isinstance(e, TemplateError):
+                raise
+            raise TemplateError(f"синтаксическая ошибка: {e}") from e
+        return frozenset(fields)
+
+    def render(self, user: User, comment: str | None = None) -> str:
+        if not self.fields:
+            return self.text
+        values = {name: PLACEHOLDERS[name](user, comment) for name in self.fields}
+        try:
+            return self.text.format(**values)
+        except (ValueError, TypeError, KeyError, AttributeError, IndexError) as e:
+            logger.warning(f"[PhraseTemplate.render] Не удалось заменить плейсхолдеры: {e}")
+            return self.text
@@ -0,0 +1,96 @@
+import logging
+import utils.logger # noqa: F401
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from utils.models.base import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["UnitOfWork"]] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """
+    Изменения ORM-объектов, накопленные за время обработки одного обновления Telegram.
+    Объекты регистрируются методами-мутациями и сохраняются одной транзакцией в commit().
+      - on_commit   : вызывается для объекта после успешной записи (например, обновить кэш)
+      - on_rollback : вызывается для каждой зарегистрированной мутации, если запись не удалась
+                      или обработка обновления завершилась ошибкой (fail)
+    """
+
+    def __init__(self) -> None:
+        self._objects: Dict[Tuple[type, Any], Any] = {}
+        self._on_commit: Dict[Tuple[type, Any], Callable[[], None]] = {}
+        self._on_rollback: List[Callable[[BaseException], None]] = []
+        self._error: Optional[BaseException] = None
+
+    def add(self, key: Any, obj: Any, on_commit: Callable[[], None],
+            on_rollback: Callable[[BaseException], None]) -> None:
+        identity = (type(obj), key)
+        self._objects[identity] = obj
+        self._on_commit[identity] = on_commit
+        self._on_rollback.append(on_rollback)
+
+    async def commit(self) -> None:
+        if not self._objects:
+            return
+        try:
+            async with AsyncSessionLocal.begin() as session:
+                # объекты отсоединены от сессии, но SQLAlchemy помнит их изменённые атрибуты:
+                # add() без SELECT запишет только их
+                session.add_all(self._objects.values())
+        except Exception as e:
+            self.rollback(e)
+            return
+        for on_commit in self._on_commit.values():
+            on_commit()
+        logger.debug(f"[UnitOfWork.commit] Сохранено объектов: {len(self._objects)}")
+        self._clear()
+
+    def fail(self, error: BaseException) -> None:
+        """
+        Помечает единицу работы неудачной: на выходе из unit_of_work() изменения будут отброшены, а не сохранены.
+        """
+        if self._error is None:
+            self._error = error
+
+    @property
+    def failed(self) -> bool:
+        return self._error is not None
+
+    def rollback(self, error: BaseException) -> None:
+        for on_rollback in self._on_rollback:
+            on_rollback(error)
+        self._clear()
+
+    def _clear(self) -> None:
+        self._objects.clear()
+        self._on_commit.clear()
+        self._on_rollback.clear()
+
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    return _current.get()
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[UnitOfWork]:
+    """
+    Открывает единицу работы на время блока: изменения, сделанные внутри, сохраняются одним коммитом на выходе,
+    а при исключении или после fail() отбрасываются (каждая мутация сообщает о своей ошибке через on_rollback).
+    """
+    uow = UnitOfWork()
+    token = _current.set(uow)
+    try:
+        yield uow
+    except BaseException as e:
+        uow.rollback(e)
+        raise
+    finally:
+        _current.reset(token)
+    if uow.failed:
+        uow.rollback(uow._error)
+    else:
+        await uow.commit()
@@ -1,11 +1,71 @@
 import logging
 import utils.logger # noqa: F401
+import threading
+from collections import OrderedDict
 from sqlalchemy import Column, Integer, String, Boolean, JSON
-from utils.models.base import Base, SessionLocal
+from config import USER_CACHE_SIZE
+from utils.models.base import Base, AsyncSessionLocal
+from utils.models.report_draft import ReportDraft, load_draft, checkpoint_draft
+from utils.models.unit_of_work import current_unit_of_work
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
+# колонки листа 'users' в порядке выгрузки
+SHEET_FIELDS = ("user_id", "name", "role", "state", "last_message_id", "is_workday", "location")
+
+# LRU-кэш пользователей: User.get отдаёт объект из памяти, методы-мутации пишут в БД и обновляют кэш.
+# Синхронизация с листом 'users' идёт в фоновом потоке, поэтому доступ под блокировкой.
+_cache: "OrderedDict[int, User]" = OrderedDict()
+_cache_lock = threading.Lock()
+# растёт при каждой инвалидации: объект, прочитанный из БД до неё, в кэш уже не кладётся
+_cache_generation = 0
+
+
+def _cache_generation_now() -> int:
+    with _cache_lock:
+        return _cache_generation
+
+
+def _cache_put(user: "User", generation: int) -> None:
+    with _cache_lock:
+        if generation != _cache_generation:
+            return
+        _cache[user.user_id] = user
+        _cache.move_to_end(user.user_id)
+        while len(_cache) > USER_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _cache_touch(user: "User") -> None:
+    # после сохранения объект поднимается в LRU, только если он всё ещё в кэше: после инвалидации
+    # (например, reload_config) или вытеснения следующий User.get перечитает пользователя из БД
+    with _cache_lock:
+        if _cache.get(user.user_id) is user:
+            _cache.move_to_end(user.user_id)
+
+
+def peek_cached_user(user_id: int) -> Optional["User"]:
+    """
+    Возвращает пользователя из кэша, не меняя порядок вытеснения (None, если его там нет).
+    """
+    with _cache_lock:
+        return _cache.get(user_id)
+
+
+def invalidate_user_cache(user_id: Optional[int] = None) -> None:
+    """
+    Убирает пользователя из кэша, а без user_id — очищает кэш целиком (после синхронизации таблицы 'users').
+    """
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
 class User(Base):
     """
     ORM-модель для таблицы 'users'.
@@ -15,7 +75,10 @@ class User(Base):
       - state              : TEXT, nullable
       - last_message_id    : INTEGER, nullable
       - is_workday         : BOOLEAN, not null, default=False
-      - daily_report_draft : JSON, nullable, default=dict
+      - daily_report_draft : JSON, nullable, default=dict — устаревшее: черновик хранится в 'report_drafts',
+                             колонка читается только при переносе старых черновиков
+      - location           : TEXT, nullable — ключ точки продаж из config.LOCATIONS (None — точка по умолчанию)
+      - sheet_dirty        : JSON, nullable — поля, ещё не выгруженные в лист 'users' (None — всё выгружено)
     """
     __tablename__ = "users"
 
@@ -26,27 +89,60 @@ class User(Base):
     last_message_id    = Column(Integer, nullable=True)
     is_workday         = Column(Boolean, nullable=False, default=False)
     daily_report_draft = Column(JSON, nullable=False, default=dict)
+    location           = Column(String, nullable=True)
+    sheet_dirty        = Column(JSON(none_as_null=True), nullable=True)
+
+    # не колонка: черновик остаётся в памяти, пока жив объект пользователя (в кэше или в обработке)
+    _draft = None
+
+    def _mark_dirty(self, *fields: str) -> None:
+        # изменения попадают в лист 'users' фоновой выгрузкой (utils.user_writeback)
+        self.sheet_dirty = sorted(set(self.sheet_dirty or []) | set(fields))
+
+    @property
+    def draft(self) -> ReportDraft:
+        """
+        Черновик отчёта по смене (загружается в память в User.get/User.create).
+        """
+        return self._draft
+
+    @staticmethod
+    def _rollback(user_id: int, error_message: str, error: BaseException) -> None:
+        # объект в памяти уже изменён, а запись не удалась — следующий User.get перечитает его из БД
+        # (после неудачного коммита атрибуты объекта сброшены, поэтому user_id передаётся заранее)
+        invalidate_user_cache(user_id)
+        logger.error(f"{error_message}: {error}", exc_info=error)
+
+    async def _save(self, error_message: str) -> None:
+        """
+        Сохраняет изменённые поля. Во время обработки обновления изменение только регистрируется в единице работы
+        и пишется одним коммитом вместе с остальными после обработчика; вне её (фоновые задачи) — сразу.
+        """
+        user_id = self.user_id
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.add(user_id, self, on_commit=lambda: _cache_touch(self),
+                    on_rollback=lambda error: self._rollback(user_id, error_message, error))
+            return
+        try:
+            async with AsyncSessionLocal.begin() as session:
+                session.add(self)
+            _cache_touch(self)
+        except Exception as e:
+            self._rollback(user_id, error_message, e)
 
     @classmethod
-    def create(cls, user_id: int, role: str, state: str, first_name: str,
+    async def create(cls, user_id: int, role: str, state: str, first_name: str,
                last_name: str | None = None, last_message_id: int | None = None,
                daily_report_draft: dict | None = None
                ) -> "User":
         name = f"{first_name} {last_name[0]}." if last_name else first_name
-        if not daily_report_draft:
-            daily_report_draft = {
-                "date": None,
-                "author": f"{name}({user_id})",
-                "wolt": None,
-                "bolt": None,
-                "yandex": None,
-                "temp": None,
-                "weather_label": None,
-                "overwrite": False
-            }
-        with SessionLocal.begin() as session:
-                existing = session.get(User, user_id)
+        generation = _cache_generation_now()
+        async with AsyncSessionLocal.begin() as session:
+                existing = await session.get(User, user_id)
                 if existing:
+                    existing._draft = await load_draft(user_id, existing.daily_report_draft)
+                    _cache_put(existing, generation)
                     return existing
                 new_user = User(
                     user_id=user_id,
@@ -54,99 +150,83 @@ class User(Base):
                     role=role,
                     state=state,
                     last_message_id=last_message_id,
-                    daily_report_draft=daily_report_draft
+                    daily_report_draft={}
                 )
+                new_user._mark_dirty(*SHEET_FIELDS)
                 session.add(new_user)
-                return new_user
+        draft = new_user._draft = await load_draft(user_id, daily_report_draft)
+        draft.update(author=f"{name}({user_id})")
+        await checkpoint_draft(user_id)
+        _cache_put(new_user, generation)
+        return new_user
+
     @classmethod
-    def get(cls, user_id: int) -> Optional["User"]:
-        with SessionLocal() as session:
-            return session.get(User, user_id)
+    async def get(cls, user_id: int) -> Optional["User"]:
+        with _cache_lock:
+            user = _cache.get(user_id)
+            if user is not None:
+                _cache.move_to_end(user_id)
+        if user is None:
+            generation = _cache_generation_now()
+            async with AsyncSessionLocal() as session:
+                user = await session.get(User, user_id)
+            if user is None:
+                return None
+            _cache_put(user, generation)
+        # черновик уже в памяти — это просто поиск в словаре
+        user._draft = await load_draft(user_id, user.daily_report_draft)
+        return user
 
-    def set_state(self, state: str):
-        try:
-            with SessionLocal.begin() as session:
-                old_state = self.state
-                self.state = state
-                session.merge(self)
-                logger.info(f"[User.set_state] Обновлено состояние пользователя {self.name}({self.user_id}): "
-                            f"'{old_state}' → '{state}'")
-        except Exception as e:
-            logger.exception(f"[User.set_state] Ошибка при обновлении состояния пользователя "
-                             f"{self.name}({self.user_id}): {e}")
+    async def set_state(self, state: str):
+        old_state = self.state
+        self.state = state
+        self._mark_dirty("state")
+        logger.info(f"[User.set_state] Обновлено состояние пользователя {self.name}({self.user_id}): "
+                    f"'{old_state}' → '{state}'")
+        await self._save(f"[User.set_state] Ошибка при обновлении состояния пользователя {self.name}({self.user_id})")
+        # смена состояния — контрольная точка черновика
+        await checkpoint_draft(self.user_id)
 
-    def set_role(self, role: str):
-        try:
-            with SessionLocal.begin() as session:
-                old_role = self.role
-                self.role = role
-                session.merge(self)
-                logger.info(f"[User.set_state] Обновлена роль пользователя "
-                            f"{self.name}({self.user_id}): '{old_role}' → '{role}'")
-        except Exception as e:
-            logger.exception(f"[User.set_state] Ошибка при обновлении роли пользователя "
-                             f"{self.name}({self.user_id}): {e}")
+    async def set_role(self, role: str):
+        old_role = self.role
+        self.role = role
+        self._mark_dirty("role")
+        logger.info(f"[User.set_state] Обновлена роль пользователя "
+                    f"{self.name}({self.user_id}): '{old_role}' → '{role}'")
+        await self._save(f"[User.set_state] Ошибка при обновлении роли пользователя {self.name}({self.user_id})")
 
-    def toggle_workday(self, flag: bool):
-        try:
-            with SessionLocal.begin() as session:
-                old_toggle = "Да" if self.is_workday else "Нет"
-                self.is_workday = flag
-                session.merge(self)
-                new_toogle = "Да" if self.is_workday else "Нет"
-                logger.info(f"[User.set_state] Обновлён тумблер 'Рабочий день' пользователя "
-                            f"{self.name}({self.user_id}): '{old_toggle}' → '{new_toogle}'")
-        except Exception as e:
-            logger.exception(f"[User.set_state] Ошибка при обновлении тумблера 'Рабочий день' "
-                             f"пользователя {self.name}({self.user_id}): {e}")
+    async def toggle_workday(self, flag: bool):
+        old_toggle = "Да" if self.is_workday else "Нет"
+        self.is_workday = flag
+        self._mark_dirty("is_workday")
+        new_toogle = "Да" if self.is_workday else "Нет"
+        logger.info(f"[User.set_state] Обновлён тумблер 'Рабочий день' пользователя "
+                    f"{self.name}({self.user_id}): '{old_toggle}' → '{new_toogle}'")
+        await self._save(f"[User.set_state] Ошибка при обновлении тумблера 'Рабочий день' "
+                         f"пользователя {self.name}({self.user_id})")
 
-    def set_last_message_id(self, message_id: int) -> None:
-        try:
-            with SessionLocal.begin() as session:
-                old_msg_id = self.last_message_id
-                self.last_message_id = message_id
-                session.merge(self)
-                logger.info(
-                    f"[User.set_last_message_id] Обновлён message_id для пользователя {self.name}({self.user_id}): "
-                    f"{old_msg_id} → {message_id}"
-                )
-        except Exception as e:
-            logger.exception(
-                f"[User.set_last_message_id] Ошибка при сохранении message_id пользователя "
-                f"{self.name}({self.user_id}): {e}"
-            )
+    async def set_last_message_id(self, message_id: int) -> None:
+        old_msg_id = self.last_message_id
+        self.last_message_id = message_id
+        self._mark_dirty("last_message_id")
+        logger.info(
+            f"[User.set_last_message_id] Обновлён message_id для пользователя {self.name}({self.user_id}): "
+            f"{old_msg_id} → {message_id}"
+        )
+        await self._save(
+            f"[User.set_last_message_id] Ошибка при сохранении message_id пользователя {self.name}({self.user_id})"
+        )
 
-    def write_to_draft(self, **kwargs) -> None:
-        try:
-            with SessionLocal.begin() as session:
-                self.daily_report_draft.update(kwargs)
-                session.merge(self)
-                logger.info(
-                    f"[User.write_to_draft] Обновлён черновик пользователя {self.name}({self.user_id}): {kwargs}"
-                )
-        except Exception as e:
-            logger.exception(
-                f"[User.write_to_draft] Ошибка при обновлении черновика пользователя {self.name}({self.user_id}): {e}"
-            )
+    async def write_to_draft(self, **kwargs) -> None:
+        # только в памяти: в БД черновик попадёт на ближайшей контрольной точке
+        self.draft.update(**kwargs)
+        logger.info(
+            f"[User.write_to_draft] Обновлён черновик пользователя {self.name}({self.user_id}): {kwargs}"
+        )
 
-    def clear_draft(self) -> None:
+    async def clear_draft(self) -> None:
         """
-        Очищает поля черновика daily_report_draft, оставляя только актуальные ключи со значениями по умолчанию.
+        Очищает поля черновика, оставляя автора; значения по умолчанию запишутся на ближайшей контрольной точке.
         """
-        try:
-            with SessionLocal.begin() as session:
-                self.daily_report_draft.update({
-                    "date": None,
-                    "wolt": None,
-                    "bolt": None,
-                    "yandex": None,
-                    "temp": None,
-                    "weather_label": None,
-                    "overwrite": False
-                })
-                session.merge(self)
-                logger.info(f"[User.clear_draft] Черновик пользователя {self.name}({self.user_id}) очищен")
-        except Exception as e:
-            logger.exception(
-                f"[User.clear_draft] Ошибка при очистке черновика пользователя {self.name}({self.user_id}): {e}"
-            )
\ No newline at end of file
+        self.draft.reset()
+        logger.info(f"[User.clear_draft] Черновик пользователя {self.name}({self.user_id}) очищен")
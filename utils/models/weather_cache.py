@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Float, String
+from utils.models.base import Base
+
+class WeatherCache(Base):
+    """
+    ORM-модель для таблицы 'weather_cache' — проанализированная погода за рабочий день.
+    Поля:
+      - date          : PK VARCHAR, дата в формате ДД.ММ.ГГГГ
+      - latitude      : PK FLOAT
+      - longitude     : PK FLOAT
+      - temp          : FLOAT, not null
+      - weather_label : VARCHAR, not null
+      - fetched_at    : DATETIME, not null — когда данные были получены из Open-Meteo
+    """
+    __tablename__ = "weather_cache"
+
+    date          = Column(String, primary_key=True)
+    latitude      = Column(Float, primary_key=True)
+    longitude     = Column(Float, primary_key=True)
+    temp          = Column(Float, nullable=False)
+    weather_label = Column(String, nullable=False)
+    fetched_at    = Column(DateTime, nullable=False)
@@ -0,0 +1,104 @@
+import logging
+import re
+import utils.logger # noqa: F401
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from telegram.ext import ContextTypes
+
+from config import DAILY_REPORT_SHEET_ID, DEFAULT_LOCATION
+from utils.executor import run_io
+from utils.google_sheets import get_worksheet
+from utils.sheets_quota import sheets_call, Priority
+from utils.models.base import SessionLocal
+from utils.models.report_index import ReportIndex
+
+logger = logging.getLogger(__name__)
+
+_built = False
+
+
+def _cell(column: list, row_number: int) -> str:
+    if row_number > len(column) or not column[row_number - 1]:
+        return ""
+    return str(column[row_number - 1][0]).strip()
+
+
+def is_report_row(row: list, date: str, location: str) -> bool:
+    # колонка I — точка продаж; пустая у старых отчётов, сделанных до появления нескольких точек
+    row_location = (str(row[8]).strip() if len(row) > 8 else "") or DEFAULT_LOCATION
+    return bool(row) and str(row[0]).strip() == date and row_location == location
+
+
+def _fetch_index_from_google(priority: Priority) -> Dict[Tuple[str, str], int]:
+    # качаем только колонки A (дата) и I (точка продаж), а не весь лист
+    worksheet = get_worksheet(DAILY_REPORT_SHEET_ID, "reports")
+    dates_column, locations_column = sheets_call(priority, worksheet.batch_get, ["A:A", "I:I"])
+    index = {}
+    for row_number in range(2, len(dates_column) + 1):
+        date = _cell(dates_column, row_number)
+        if date:
+            index[(date, _cell(locations_column, row_number) or DEFAULT_LOCATION)] = row_number
+    return index
+
+
+def rebuild_report_index(priority: Priority = Priority.BULK) -> int:
+    """
+    Сверяет локальный индекс отчётов с листом 'reports' и исправляет расхождения.
+    Возвращает количество исправленных записей. priority — приоритет запроса к Google Sheets.
+    """
+    global _built
+    index = _fetch_index_from_google(priority)
+    with SessionLocal.begin() as session:
+        current = {(entry.date, entry.location): entry.row_number for entry in session.query(ReportIndex).all()}
+        changed = sum(1 for key, row_number in index.items() if current.get(key) != row_number)
+        changed += sum(1 for key in current if key not in index)
+        if changed:
+            session.execute(delete(ReportIndex))
+            session.add_all(ReportIndex(date=date, location=location, row_number=row_number)
+                            for (date, location), row_number in index.items())
+    _built = True
+    logger.info(f"[rebuild_report_index] Индекс отчётов сверен с листом 'reports': {len(index)} отчётов, "
+                f"исправлено записей: {changed}")
+    return changed
+
+
+def _ensure_index() -> None:
+    # индекс хранится в БД между перезапусками; строим его с нуля, только если он пуст
+    if _built:
+        return
+    with SessionLocal() as session:
+        count = session.scalar(select(func.count()).select_from(ReportIndex))
+    if not count:
+        # без индекса пользователь ждёт ответа на проверку даты
+        rebuild_report_index(Priority.INTERACTIVE)
+
+
+def lookup_report_row(date: str, location: str = DEFAULT_LOCATION) -> Optional[int]:
+    _ensure_index()
+    with SessionLocal() as session:
+        entry = session.get(ReportIndex, (date, location))
+        return entry.row_number if entry else None
+
+
+def remember_report_row(date: str, location: str, row_number: int) -> None:
+    with SessionLocal.begin() as session:
+        session.merge(ReportIndex(date=date, location=location, row_number=row_number))
+
+
+def row_number_from_range(updated_range: str) -> Optional[int]:
+    """
+    Достаёт номер строки из диапазона вида "reports!A15:I15", который возвращает append_row.
+    """
+    match = re.search(r"![A-Z]+(\d+)", updated_range or "")
+    return int(match.group(1)) if match else None
+
+
+async def reconcile_report_index_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Периодическая задача: сверяет индекс с листом (на случай правок таблицы вручную).
+    """
+    try:
+        await run_io("google_bulk", rebuild_report_index)
+    except Exception as e:
+        logger.error(f"[reconcile_report_index_job] Не удалось сверить индекс отчётов: {e}")
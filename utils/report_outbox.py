@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import utils.logger # noqa: F401
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import pytz
+from telegram.ext import ContextTypes
+
+from config import DAILY_REPORT_SHEET_ID, DEFAULT_LOCATION, TIMEZONE, REPORT_OUTBOX_RETRY_BASE_SECONDS, \
+    REPORT_OUTBOX_RETRY_MAX_SECONDS
+from utils.executor import run_io
+from utils.google_sheets import get_worksheet
+from utils.models.base import SessionLocal
+from utils.models.report_outbox import ReportOutbox
+from utils.sheets_quota import sheets_call, Priority
+from utils.report_index import lookup_report_row, remember_report_row, rebuild_report_index, \
+    row_number_from_range, is_report_row
+
+logger = logging.getLogger(__name__)
+
+_drain_lock = asyncio.Lock()
+
+
+def _build_row(report: Dict[str, Any], location: str) -> List[Any]:
+    return [
+        report["date"],
+        report.get("author"),
+        report.get("wolt"),
+        report.get("bolt"),
+        report.get("yandex"),
+        report.get("temp"),
+        report.get("weather_label"),
+        datetime.now(pytz.timezone(TIMEZONE)).strftime("%d.%m.%y %H:%M"),
+        location
+    ]
+
+
+def enqueue_report(report: Dict[str, Any]) -> None:
+    """
+    Сохраняет отчёт в локальную очередь 'report_outbox'. В лист 'reports' его запишет фоновая задача.
+    Если отчёт за ту же дату и точку ещё ждёт отправки, он заменяется новым.
+    """
+    location = report.get("location") or DEFAULT_LOCATION
+    now = datetime.now()
+    with SessionLocal.begin() as session:
+        pending = session.query(ReportOutbox).filter_by(date=report["date"], location=location).first()
+        if pending:
+            pending.row_data = _build_row(report, location)
+            pending.next_attempt_at = now
+        else:
+            session.add(ReportOutbox(
+                date=report["date"],
+                location=location,
+                row_data=_build_row(report, location),
+                overwrite=bool(report.get("overwrite")),
+                created_at=now,
+                attempts=0,
+                next_attempt_at=now
+            ))
+
+
+def has_pending_report(date: str, location: str = DEFAULT_LOCATION) -> bool:
+    with SessionLocal() as session:
+        return session.query(ReportOutbox.id).filter_by(date=date, location=location).first() is not None
+
+
+def _find_rows(worksheet, entries: List[ReportOutbox]) -> Dict[int, int]:
+    """
+    Находит строки для перезаписи по индексу и проверяет их одним batch_get.
+    Возвращает id записи очереди → номер строки (для ненайденных отчётов записи нет).
+    """
+    candidates = {entry.id: lookup_report_row(entry.date, entry.location) for entry in entries}
+    candidates = {entry_id: row for entry_id, row in candidates.items() if row}
+    if candidates:
+        ranges = [f"A{row}:I{row}" for row in candidates.values()]
+        fetched = sheets_call(Priority.REPORT_WRITE, worksheet.batch_get, ranges)
+        by_id = {entry.id: entry for entry in entries}
+        stale = [entry_id for (entry_id, row), values in zip(candidates.items(), fetched)
+                 if not is_report_row(values[0] if values else [], by_id[entry_id].date, by_id[entry_id].location)]
+        if stale:
+            # лист отсортировали или отредактировали вручную — пересобираем индекс и ищем заново
+            logger.warning(f"[_find_rows] Индекс отчётов устарел для {len(stale)} записей, пересобираю")
+            rebuild_report_index(Priority.REPORT_WRITE)
+            for entry_id in stale:
+                candidates[entry_id] = lookup_report_row(by_id[entry_id].date, by_id[entry_id].location)
+    return {entry_id: row for entry_id, row in candidates.items() if row}
+
+
+def drain_report_outbox() -> int:
+    """
+    Отправляет все отчёты из очереди, у которых подошло время: новые — одним append_rows,
+    перезаписи — одним batch_update. При ошибке откладывает попытку с экспоненциальной задержкой.
+    Возвращает количество записанных отчётов.
+    """
+    now = datetime.now()
+    with SessionLocal() as session:
+        entries = (session.query(ReportOutbox)
+                   .filter(ReportOutbox.next_attempt_at <= now)
+                   .order_by(ReportOutbox.id)
+                   .all())
+    if not entries:
+        return 0
+
+    try:
+        worksheet = get_worksheet(DAILY_REPORT_SHEET_ID, "reports")
+        overwrites = [entry for entry in entries if entry.overwrite]
+        rows = _find_rows(worksheet, overwrites)
+        for entry in overwrites:
+            if entry.id not in rows:
+                logger.warning(f"[drain_report_outbox] Отчёт за {entry.date} ({entry.location}) для перезаписи "
+                               f"не найден в листе 'reports', добавляю новой строкой")
+        appends = [entry for entry in entries if entry.id not in rows]
+
+        if rows:
+            sheets_call(Priority.REPORT_WRITE, worksheet.batch_update, [
+                {"range": f"A{row}:I{row}", "values": [entry.row_data]}
+                for entry in overwrites if (row := rows.get(entry.id))
+            ])
+        if appends:
+            response = sheets_call(Priority.REPORT_WRITE, worksheet.append_rows, [entry.row_data for entry in appends])
+            first_row = row_number_from_range(response.get("updates", {}).get("updatedRange"))
+            if first_row:
+                for offset, entry in enumerate(appends):
+                    remember_report_row(entry.date, entry.location, first_row + offset)
+            else:
+                logger.warning(f"[drain_report_outbox] Не удалось определить строки новых отчётов: {response}")
+                rebuild_report_index(Priority.REPORT_WRITE)
+    except Exception as e:
+        with SessionLocal.begin() as session:
+            for entry in entries:
+                attempts = entry.attempts + 1
+                delay = min(REPORT_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), REPORT_OUTBOX_RETRY_MAX_SECONDS)
+                session.query(ReportOutbox).filter_by(id=entry.id).update({
+                    "attempts": attempts,
+                    "next_attempt_at": datetime.now() + timedelta(seconds=delay),
+                    "last_error": str(e)
+                })
+        logger.error(f"[drain_report_outbox] Не удалось записать {len(entries)} отчётов в лист 'reports' "
+                     f"(попытка {entries[0].attempts + 1}): {e}")
+        return 0
+
+    with SessionLocal.begin() as session:
+        for entry in entries:
+            sent = session.query(ReportOutbox).filter_by(id=entry.id).filter(
+                ReportOutbox.next_attempt_at == entry.next_attempt_at)
+            if not sent.delete():
+                # отчёт заменили новым, пока шла отправка: строка уже есть в листе, поэтому
+                # новая версия уйдёт следующей пачкой как перезапись
+                session.query(ReportOutbox).filter_by(id=entry.id).update({"overwrite": True})
+    logger.info(f"[drain_report_outbox] В лист 'reports' записано отчётов: {len(entries)} "
+                f"(новых: {len(appends)}, перезаписано: {len(rows)})")
+    return len(entries)
+
+
+async def flush_report_outbox() -> None:
+    async with _drain_lock:
+        try:
+            await run_io("google", drain_report_outbox)
+        except Exception as e:
+            logger.error(f"[flush_report_outbox] Ошибка при отправке очереди отчётов: {e}")
+
+
+async def report_outbox_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Периодическая задача: отправляет накопившиеся отчёты (в том числе после перезапуска бота).
+    """
+    await flush_report_outbox()
@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import utils.logger # noqa: F401
+from enum import IntEnum
+from typing import Any, Callable, Dict
+
+from telegram.ext import ContextTypes
+
+from config import SHEETS_REQUESTS_PER_MINUTE, SHEETS_MAX_WAIT_SECONDS, SHEETS_RETRY_LIMIT, \
+    SHEETS_BACKOFF_BASE_SECONDS, SHEETS_BACKOFF_MAX_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """
+    Классы приоритета запросов к Google Sheets: чем меньше значение, тем раньше запрос получает квоту.
+    """
+    INTERACTIVE = 0   # пользователь ждёт ответа (проверка даты и т.п.)
+    REPORT_WRITE = 1  # запись отчётов из очереди
+    BULK = 2          # массовые операции администратора и фоновые синхронизации
+
+
+class QuotaRejectedError(Exception):
+    """
+    Запрос не дождался квоты Google Sheets за отведённое его приоритету время.
+    """
+
+
+class SheetsScheduler:
+    """
+    Общий планировщик запросов к Google Sheets API: token bucket размером с поминутную квоту,
+    очередь с приоритетами и пауза всего потока запросов после ответа 429.
+    Вызывается из потоков пула I/O, поэтому синхронизация на threading.Condition.
+    """
+
+    def __init__(self, requests_per_minute: int, max_wait: Dict[Priority, float], retry_limit: int,
+                 backoff_base: float, backoff_max: float):
+        self._capacity = float(requests_per_minute)
+        self._rate = requests_per_minute / 60.0
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._max_wait = max_wait
+        self._retry_limit = retry_limit
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._condition = threading.Condition()
+        self._waiting: list = []
+        self._sequence = itertools.count()
+        self._stats = {"total": 0, "queued": 0, "delayed": 0, "rejected": 0}
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def _acquire(self, priority: Priority) -> None:
+        ticket = (int(priority), next(self._sequence))
+        with self._condition:
+            self._stats["total"] += 1
+            deadline = time.monotonic() + self._max_wait[priority]
+            heapq.heappush(self._waiting, ticket)
+            queued = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiting[0] == ticket and now >= self._paused_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    if now >= deadline:
+                        self._stats["rejected"] += 1
+                        raise QuotaRejectedError(
+                            f"нет квоты Google Sheets для запроса с приоритетом {priority.name} "
+                            f"за {self._max_wait[priority]:.0f} с"
+                        )
+                    if not queued:
+                        queued = True
+                        self._stats["queued"] += 1
+                    if now < self._paused_until:
+                        wait = self._paused_until - now
+                    elif self._tokens < 1:
+                        wait = (1 - self._tokens) / self._rate
+                    else:
+                        wait = deadline - now  # впереди запрос с более высоким приоритетом — ждём уведомления
+                    self._condition.wait(min(wait, deadline - now))
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def _pause(self, seconds: float) -> None:
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._condition.notify_all()
+
+    @staticmethod
+    def _reset_client(error: Exception) -> None:
+        # импорт здесь: utils.google_sheets сам импортирует планировщик
+        from utils.google_sheets import reset_google_client
+
+        logger.warning(f"[SheetsScheduler.call] Ошибка авторизации или соединения с Google Sheets: {error}")
+        reset_google_client()
+
+    def call(self, priority: Priority, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Выполняет запрос к Google Sheets, дождавшись квоты. При ответе 429 приостанавливает все запросы
+        с экспоненциальной задержкой и повторяет (не больше SHEETS_RETRY_LIMIT раз).
+        После ошибки авторизации или соединения сбрасывает клиента Google Sheets — следующий запрос
+        пойдёт через новую авторизацию и HTTP-сессию.
+        """
+        from google.auth.exceptions import RefreshError, TransportError
+        from gspread.exceptions import APIError
+        from requests.exceptions import ConnectionError as RequestsConnectionError
+
+        for attempt in range(self._retry_limit + 1):
+            self._acquire(priority)
+            try:
+                return func(*args, **kwargs)
+            except (RefreshError, TransportError, RequestsConnectionError) as e:
+                self._reset_client(e)
+                raise
+            except APIError as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status == 401:
+                    self._reset_client(e)
+                if status != 429 or attempt == self._retry_limit:
+                    raise
+                delay = min(self._backoff_base * 2 ** attempt, self._backoff_max)
+                with self._condition:
+                    self._stats["delayed"] += 1
+                logger.warning(f"[SheetsScheduler.call] Google Sheets ответил 429, пауза {delay:.0f} с "
+                               f"(попытка {attempt + 1}, приоритет {priority.name})")
+                self._pause(delay)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        total — всего запросов; queued — ждали квоту в очереди; delayed — повторены после 429;
+        rejected — отклонены, не дождавшись квоты.
+        """
+        with self._condition:
+            return dict(self._stats)
+
+
+scheduler = SheetsScheduler(
+    requests_per_minute=SHEETS_REQUESTS_PER_MINUTE,
+    max_wait={Priority(priority): seconds for priority, seconds in SHEETS_MAX_WAIT_SECONDS.items()},
+    retry_limit=SHEETS_RETRY_LIMIT,
+    backoff_base=SHEETS_BACKOFF_BASE_SECONDS,
+    backoff_max=SHEETS_BACKOFF_MAX_SECONDS,
+)
+
+
+def sheets_call(priority: Priority, func: Callable[..., Any], *args, **kwargs) -> Any:
+    return scheduler.call(priority, func, *args, **kwargs)
+
+
+def log_sheets_stats() -> None:
+    stats = scheduler.stats()
+    logger.info(f"[sheets_quota] Запросы к Google Sheets: всего {stats['total']}, ждали в очереди {stats['queued']}, "
+                f"повторены после 429 {stats['delayed']}, отклонены {stats['rejected']}")
+
+
+async def log_sheets_stats_job(context: ContextTypes.DEFAULT_TYPE):
+    log_sheets_stats()
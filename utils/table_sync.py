@@ -0,0 +1,89 @@
+import hashlib
+import json
+import logging
+import utils.logger # noqa: F401
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Sequence
+
+from sqlalchemy import String, delete, insert, select, update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncSummary:
+    """
+    Итог синхронизации одной таблицы: сколько строк добавлено, изменено, удалено и осталось без изменений.
+    """
+    table: str
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated + self.deleted
+
+    def __str__(self) -> str:
+        return (f"'{self.table}': +{self.inserted} ~{self.updated} -{self.deleted} "
+                f"(без изменений {self.unchanged})")
+
+
+def _row_hash(values: Sequence[Any]) -> str:
+    return hashlib.sha1(json.dumps(values, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def sync_table(session: Session, model, rows: List[Dict[str, Any]], columns: Sequence[str],
+               delete_missing: bool = True, keep: Collection[Any] = ()) -> SyncSummary:
+    """
+    Приводит таблицу model к строкам rows, меняя только то, что отличается.
+    Строки сравниваются по хэшу колонок columns (ключ — первичный ключ модели): новые добавляются,
+    отличающиеся обновляются только в колонках columns, отсутствующие в rows удаляются (если delete_missing),
+    кроме строк с ключами из keep.
+    Изменения применяются пакетами (executemany) в переданной сессии — транзакцией управляет вызывающий код.
+    """
+    table = model.__table__
+    key = table.primary_key.columns.values()[0].name
+    # Google Sheets отдаёт числа в текстовых ячейках как int/float — приводим их к строке, как их вернёт БД
+    text_columns = {column.name for column in table.columns if isinstance(column.type, String)}
+
+    def _normalize(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {name: str(value) if name in text_columns and value is not None else value
+                for name, value in row.items()}
+
+    incoming = {}
+    for row in rows:
+        row = _normalize(row)
+        incoming[row[key]] = row
+
+    current = {
+        row[0]: _row_hash(list(row[1:]))
+        for row in session.execute(select(table.c[key], *(table.c[name] for name in columns)))
+    }
+
+    inserts, updates = [], []
+    for row_key, row in incoming.items():
+        row_hash = current.get(row_key)
+        if row_hash is None:
+            inserts.append(row)
+        elif row_hash != _row_hash([row.get(name) for name in columns]):
+            updates.append({key: row_key, **{name: row.get(name) for name in columns}})
+    deletes = [row_key for row_key in current if row_key not in incoming and row_key not in keep] \
+        if delete_missing else []
+
+    if inserts:
+        session.execute(insert(model), inserts)
+    if updates:
+        session.execute(update(model), updates)
+    if deletes:
+        session.execute(delete(model).where(table.c[key].in_(deletes)))
+
+    return SyncSummary(
+        table=table.name,
+        inserted=len(inserts),
+        updated=len(updates),
+        deleted=len(deletes),
+        unchanged=len(incoming) - len(inserts) - len(updates),
+    )
@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+import utils.logger # noqa: F401
+from typing import Any, Dict
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import TELEGRAM_GLOBAL_PER_SECOND, TELEGRAM_CHAT_PER_SECOND, TELEGRAM_CHAT_BURST, TELEGRAM_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# методы, которые Telegram ограничивает по чату (отправка и правка сообщений)
+_CHAT_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+# сколько корзин чатов держать, прежде чем выбросить заполненные (неактивные) чаты
+_MAX_CHAT_BUCKETS = 1000
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class OutboundScheduler(BaseRateLimiter):
+    """
+    Планировщик исходящих запросов к Bot API (подключается через ApplicationBuilder.rate_limiter, поэтому через него
+    проходят все вызовы context.bot): общий token bucket и token bucket на чат и единая обработка RetryAfter.
+    Правки одного сообщения здесь не сливаются: обновления пользователя обрабатываются по очереди, а правки внутри
+    обработчика идут одна за другой, поэтому двух ждущих правок одного сообщения не бывает. Промежуточные экраны
+    сливаются с итоговыми раньше — в BotMessage.edit_while.
+    Работает в цикле событий бота, поэтому обходится без блокировок: между проверкой и взятием токена нет await.
+    """
+
+    def __init__(self, global_per_second: float, chat_per_second: float, chat_burst: int, max_retries: int):
+        self._global = _TokenBucket(global_per_second, global_per_second)
+        self._chat_rate = chat_per_second
+        self._chat_burst = chat_burst
+        self._chats: Dict[Any, _TokenBucket] = {}
+        self._max_retries = max_retries
+        self._paused_until = 0.0
+        self._stats = {"total": 0, "delayed": 0, "coalesced": 0, "retried": 0, "skipped": 0}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        log_outbound_stats()
+
+    def _chat_bucket(self, chat_id: Any) -> _TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= _MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                for key, idle in list(self._chats.items()):
+                    idle.refill(now)
+                    if idle.tokens >= idle.capacity:
+                        del self._chats[key]
+            bucket = self._chats[chat_id] = _TokenBucket(self._chat_rate, self._chat_burst)
+        return bucket
+
+    async def _acquire(self, chat_id: Any) -> None:
+        chat = self._chat_bucket(chat_id) if chat_id is not None else None
+        delayed = False
+        while True:
+            now = time.monotonic()
+            self._global.refill(now)
+            wait = max(self._paused_until - now, self._global.wait_time())
+            if chat is not None:
+                chat.refill(now)
+                wait = max(wait, chat.wait_time())
+            if wait <= 0:
+                self._global.tokens -= 1
+                if chat is not None:
+                    chat.tokens -= 1
+                return
+            if not delayed:
+                delayed = True
+                self._stats["delayed"] += 1
+            await asyncio.sleep(wait)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        self._stats["total"] += 1
+        chat_id = data.get("chat_id") if endpoint.startswith(_CHAT_LIMITED_PREFIXES) else None
+        for attempt in range(self._max_retries + 1):
+            await self._acquire(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self._max_retries:
+                    raise
+                self._stats["retried"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                logger.warning(f"[OutboundScheduler] Telegram просит подождать {e.retry_after} с перед {endpoint} "
+                               f"(chat_id={chat_id}, попытка {attempt + 1})")
+
+    def record_coalesced(self) -> None:
+        # промежуточный экран не отправлялся: итоговый был готов раньше (BotMessage.edit_while)
+        self._stats["coalesced"] += 1
+
+    def record_skipped(self) -> None:
+        # правка не отправлялась: сообщение уже показывает ровно это содержимое (BotMessage.edit)
+        self._stats["skipped"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        total — всего запросов; delayed — ждали лимит; retried — повторены после RetryAfter. Правки, которые
+        вообще не дошли до планировщика: coalesced — промежуточные экраны, слитые с итоговым; skipped — правки
+        без изменений.
+        """
+        return dict(self._stats)
+
+
+outbound = OutboundScheduler(
+    global_per_second=TELEGRAM_GLOBAL_PER_SECOND,
+    chat_per_second=TELEGRAM_CHAT_PER_SECOND,
+    chat_burst=TELEGRAM_CHAT_BURST,
+    max_retries=TELEGRAM_MAX_RETRIES,
+)
+
+
+def log_outbound_stats() -> None:
+    stats = outbound.stats()
+    logger.info(f"[telegram_outbound] Запросы к Telegram: всего {stats['total']}, ждали лимит {stats['delayed']}, "
+                f"промежуточных экранов слито с итоговым {stats['coalesced']}, повторены после RetryAfter {stats['retried']}, "
+                f"пропущены правки без изменений {stats['skipped']}")
@@ -8,7 +8,7 @@ import utils.logger # noqa: F401
 logger = logging.getLogger(__name__)
 
 async def delete_message_from_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user = User.get(update.effective_user.id)
+    user = await User.get(update.effective_user.id)
     chat_id = update.effective_chat.id
 
     try:
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import utils.logger # noqa: F401
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor, ContextTypes
+
+from utils.models.unit_of_work import current_unit_of_work, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+
+class UnitOfWorkUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает обновления разных пользователей параллельно, а обновления одного пользователя — по очереди
+    (его состояние в User.state — это конечный автомат, два обработчика сразу его бы сломали).
+      - max_concurrent_updates : сколько обновлений может быть в работе, включая ждущие своей очереди
+      - concurrency            : сколько обработчиков выполняется одновременно
+    Каждое обновление оборачивается в единицу работы: изменения пользователей сохраняются одним коммитом
+    после обработки. Исключения обработчиков PTB перехватывает сам, поэтому откат по ошибке делает
+    unit_of_work_error_handler (регистрируется в bot.py).
+    """
+
+    def __init__(self, max_concurrent_updates: int, concurrency: int):
+        super().__init__(max_concurrent_updates)
+        # слот берётся уже после очереди пользователя: ждущие обновления одного пользователя не занимают слоты
+        self._slots = asyncio.BoundedSemaphore(concurrency)
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._user_waiters: Dict[int, int] = {}
+
+    @staticmethod
+    def _user_id(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_user:
+            return update.effective_user.id
+        return None
+
+    async def _process(self, coroutine: Awaitable[Any]) -> None:
+        async with self._slots:
+            async with unit_of_work():
+                await coroutine
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        user_id = self._user_id(update)
+        if user_id is None:
+            await self._process(coroutine)
+            return
+
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = self._user_locks[user_id] = asyncio.Lock()
+        self._user_waiters[user_id] = self._user_waiters.get(user_id, 0) + 1
+        try:
+            async with lock:
+                await self._process(coroutine)
+        finally:
+            # замок нужен, только пока у пользователя есть обновления в работе
+            self._user_waiters[user_id] -= 1
+            if not self._user_waiters[user_id]:
+                del self._user_waiters[user_id]
+                del self._user_locks[user_id]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+async def unit_of_work_error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """
+    Обработчик ошибок приложения. PTB передаёт исключение обработчика сюда, а не наружу, и без пометки единица работы
+    сохранила бы изменения, сделанные до ошибки. Вызывается в той же задаче, что и обработчик (block=True),
+    поэтому видит его единицу работы.
+    """
+    update_id = update.update_id if isinstance(update, Update) else None
+    logger.error(f"[unit_of_work_error_handler] Ошибка при обработке обновления {update_id}: {context.error}",
+                 exc_info=context.error)
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.fail(context.error)
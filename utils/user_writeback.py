@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import utils.logger # noqa: F401
+from typing import Any, Dict, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from telegram.ext import ContextTypes
+
+from config import BOT_CONFIG_SHEET_ID
+from utils.executor import run_io
+from utils.google_sheets import get_worksheet
+from utils.models.base import SessionLocal, AsyncSessionLocal
+from utils.models.user import User, SHEET_FIELDS, peek_cached_user
+from utils.sheets_quota import sheets_call, Priority
+
+logger = logging.getLogger(__name__)
+
+_flush_lock = asyncio.Lock()
+
+
+def _cell_value(user: User, field: str) -> Any:
+    value = getattr(user, field)
+    if field == "is_workday":
+        return "TRUE" if value else "FALSE"
+    return "" if value is None else value
+
+
+async def _claim_changes(full: bool) -> Dict[int, Dict[str, Any]]:
+    """
+    Забирает изменённые поля пользователей вместе с текущими значениями и снимает отметки.
+    full=True — все поля всех пользователей.
+    """
+    query = select(User)
+    if not full:
+        query = query.where(User.sheet_dirty.isnot(None))
+    async with AsyncSessionLocal() as session:
+        users = (await session.execute(query)).scalars().all()
+    changes = {}
+    for user in users:
+        fields = SHEET_FIELDS if full else user.sheet_dirty
+        changes[user.user_id] = {field: _cell_value(user, field) for field in fields}
+
+    async with AsyncSessionLocal.begin() as session:
+        for user in users:
+            if user.sheet_dirty is None:
+                continue
+            # отметки, которые успели поменяться после выборки, остаются до следующей выгрузки
+            await session.execute(update(User)
+                                  .where(User.user_id == user.user_id, User.sheet_dirty == user.sheet_dirty)
+                                  .values(sheet_dirty=None)
+                                  .execution_options(synchronize_session=False))
+    for user_id, fields in changes.items():
+        _clear_cached_marks(user_id, fields)
+    return changes
+
+
+def _clear_cached_marks(user_id: int, fields: Dict[str, Any]) -> None:
+    # объект из кэша пользователей иначе вернёт снятые отметки при следующей мутации. Отметка остаётся, если значение
+    # в кэше отличается от выгруженного: его поменял обработчик, чья единица работы ещё не закоммичена
+    cached = peek_cached_user(user_id)
+    if cached is None:
+        return
+    left = [field for field in cached.sheet_dirty or []
+            if field not in fields or _cell_value(cached, field) != fields[field]]
+    # в БД отметки уже сняты: оставшиеся запишутся ближайшим коммитом, даже если список не изменится
+    set_committed_value(cached, "sheet_dirty", None)
+    if left:
+        cached.sheet_dirty = left
+
+
+async def _restore_changes(changes: Dict[int, Dict[str, Any]]) -> None:
+    # выгрузка не удалась — возвращаем отметки, значения возьмём свежие при следующей попытке
+    async with AsyncSessionLocal.begin() as session:
+        for user_id, fields in changes.items():
+            user = await session.get(User, user_id)
+            if user:
+                user._mark_dirty(*fields)
+            cached = peek_cached_user(user_id)
+            if cached is not None:
+                cached._mark_dirty(*fields)
+
+
+def _write_changes(changes: Dict[int, Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Записывает изменённые ячейки в лист 'users' одним batch_update, новых пользователей — одним append_rows.
+    Строку пользователя находит по колонке A (user_id), колонку поля — по строке заголовков.
+    Возвращает (обновлено ячеек, добавлено строк).
+    """
+    from gspread.utils import rowcol_to_a1
+
+    worksheet = get_worksheet(BOT_CONFIG_SHEET_ID, "users")
+    header_row, ids_column = sheets_call(Priority.BULK, worksheet.batch_get, ["1:1", "A:A"])
+    header = [str(title).strip() for title in (header_row[0] if header_row else [])]
+    data = []
+    missing = [field for field in SHEET_FIELDS if field not in header]
+    if missing:
+        data.append({"range": rowcol_to_a1(1, len(header) + 1), "values": [missing]})
+        header += missing
+
+    rows = {str(cell[0]).strip(): row_number
+            for row_number, cell in enumerate(ids_column[1:], start=2) if cell}
+    new_users = []
+    for user_id, fields in changes.items():
+        row_number = rows.get(str(user_id))
+        if row_number is None:
+            new_users.append(user_id)
+            continue
+        for field, value in fields.items():
+            data.append({"range": rowcol_to_a1(row_number, header.index(field) + 1), "values": [[value]]})
+
+    new_rows = []
+    if new_users:
+        with SessionLocal() as session:
+            for user in session.query(User).filter(User.user_id.in_(new_users)).all():
+                values = {field: _cell_value(user, field) for field in SHEET_FIELDS}
+                new_rows.append([values.get(title, "") for title in header])
+
+    if data:
+        sheets_call(Priority.BULK, worksheet.batch_update, data)
+    if new_rows:
+        sheets_call(Priority.BULK, worksheet.append_rows, new_rows)
+    return len(data), len(new_rows)
+
+
+async def flush_user_changes(full: bool = False) -> int:
+    """
+    Выгружает в лист 'users' изменения пользователей, накопленные с прошлой выгрузки.
+    full=True — записывает все поля всех пользователей (без очистки листа).
+    Возвращает количество выгруженных пользователей.
+    """
+    async with _flush_lock:
+        changes = await _claim_changes(full)
+        if not changes:
+            return 0
+        try:
+            cells, appended = await run_io("google_bulk", _write_changes, changes)
+        except Exception as e:
+            await _restore_changes(changes)
+            logger.error(f"[flush_user_changes] Не удалось выгрузить изменения {len(changes)} пользователей "
+                         f"в лист 'users': {e}")
+            return 0
+    logger.info(f"[flush_user_changes] В лист 'users' выгружены изменения {len(changes)} пользователей: "
+                f"ячеек обновлено {cells}, строк добавлено {appended}")
+    return len(changes)
+
+
+async def users_writeback_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Периодическая задача: держит лист 'users' в актуальном состоянии.
+    """
+    await flush_user_changes()
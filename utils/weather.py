@@ -1,116 +1,316 @@
+import asyncio
 import logging
 import utils.logger # noqa: F401
-from datetime import datetime
+from datetime import datetime, timedelta
 
-import requests
-from typing import Tuple, List
+import aiohttp
+import pytz
+from sqlalchemy import select
+from typing import Dict, Tuple, List, Optional
 
 from telegram.ext import ContextTypes
 
-from config import OPENMETEO_LATITUDE, OPENMETEO_LONGITUDE, WORK_START_HOUR, WORK_END_HOUR
+from config import LOCATIONS, DEFAULT_LOCATION, WORK_START_HOUR, WORK_END_HOUR, OPENMETEO_URL, OPENMETEO_TIMEOUT, \
+    WEATHER_TODAY_TTL_MINUTES, TIMEZONE
+from utils.models.base import AsyncSessionLocal
 from utils.models.messages import BotMessage
+from utils.models.weather_cache import WeatherCache
 from utils.models import User
 
 logger = logging.getLogger(__name__)
 
-def _get_weather(date_str: str) -> dict | None:
-    def _weather_request() -> Tuple[List[float], List[int], List[float]] | None:
-        params = {
-            'latitude': OPENMETEO_LATITUDE,
-            'longitude': OPENMETEO_LONGITUDE,
-            'hourly': 'temperature_2m,precipitation,cloudcover',
-            'timezone': 'auto',
-            'start_date': formatted_date,
-            'end_date': formatted_date
-        }
-        logger.debug(f"Params: {params}")
+# Параметры порогов
+PRECIP_MIN = 0.1
+STRONG_RAIN = 2.0
+STRONG_HOURS_MIN = 2
+HEAVY_TOTAL_PRECIP = 5.0
+CLEAR_CLOUD_MAX = 50
+PARTLY_CLOUDY_MAX = 80
 
-        try:
-            res = requests.get('https://api.open-meteo.com/v1/forecast', params=params, timeout=10)
-            data = res.json()
-        except Exception as e:
-            logger.error(f"[get_weather._weather_request] Ошибка при запросе в Open-Meteo за {date_str} - {e}")
-            return None
-
-        hourly = data.get('hourly', {})
-        times   = hourly.get('time', [])
-        temps   = hourly.get('temperature_2m', [])
-        clouds  = hourly.get('cloudcover', [])
-        precips = hourly.get('precipitation', [])
-
-        temps_list, clouds_list, precips_list = [], [], []
-        for time_str, temp, cloud, precip in zip(times, temps, clouds, precips):
-            hour = int(time_str[11:13])
-            if WORK_START_HOUR <= hour < WORK_END_HOUR:
-                temps_list.append(temp)
-                clouds_list.append(cloud)
-                precips_list.append(precip)
-
-        return temps_list, clouds_list, precips_list
-
-    def _analyze_weather(weather_lists: Tuple[List[float], List[float], List[float]]) -> dict:
-        temps, clouds, precips = weather_lists
-
-        # Вторая по величине температура
-        sorted_temps = sorted(temps, reverse=True)
-        second_highest = sorted_temps[1] if len(sorted_temps) >= 2 else sorted_temps[0]
-        second_highest_temp = round(second_highest, 1)
-
-        # Параметры порогов
-        precip_min = 0.1
-        strong_rain = 2.0
-        hours = len(temps)
-        total_precip = sum(precips)
-        rainy_hours = sum(1 for p in precips if p >= precip_min)
-        strong_hours = sum(1 for p in precips if p >= strong_rain)
-        clear_hours = sum(1 for c in clouds if c <= 50)
-        avg_cloud = sum(clouds) / hours if hours else 0
-
-        # Классификация
-        if strong_hours >= 2 or total_precip >= 5.0:
-            label = "Пасмурно с сильными осадками"
-        elif rainy_hours >= 1:
-            if clear_hours > hours / 2:
-                label = "Ясно или малооблачно (был кратковременный дождь)"
-            else:
-                label = "Пасмурно с кратковременными осадками"
+LABEL_HEAVY_PRECIPITATION = "Пасмурно с сильными осадками"
+LABEL_CLEAR_SHORT_RAIN = "Ясно или малооблачно (был кратковременный дождь)"
+LABEL_PRECIPITATION = "Пасмурно с кратковременными осадками"
+LABEL_CLEAR = "Ясно или малооблачно"
+LABEL_PARTLY_CLOUDY = "Облачно с прояснениями"
+LABEL_CLOUDY = "Пасмурно без осадков"
+
+_tz = pytz.timezone(TIMEZONE)
+
+_session: Optional[aiohttp.ClientSession] = None
+# Запросы погоды, которые уже выполняются (ключ — дата и точка продаж):
+# повторные обращения ждут их, а не идут в Open-Meteo
+_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+def _get_session() -> aiohttp.ClientSession:
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=OPENMETEO_TIMEOUT))
+    return _session
+
+async def close_weather_session() -> None:
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logger.info("[close_weather_session] HTTP-сессия Open-Meteo закрыта")
+    _session = None
+
+def _filter_work_hours(data: dict) -> Tuple[List[float], List[float], List[float]]:
+    hourly = data.get('hourly', {})
+    times   = hourly.get('time', [])
+    temps   = hourly.get('temperature_2m', [])
+    clouds  = hourly.get('cloudcover', [])
+    precips = hourly.get('precipitation', [])
+
+    temps_list, clouds_list, precips_list = [], [], []
+    for time_str, temp, cloud, precip in zip(times, temps, clouds, precips):
+        hour = int(time_str[11:13])
+        if WORK_START_HOUR <= hour < WORK_END_HOUR:
+            temps_list.append(temp)
+            clouds_list.append(cloud)
+            precips_list.append(precip)
+
+    return temps_list, clouds_list, precips_list
+
+def _analyze_weather(weather_lists: Tuple[List[float], List[float], List[float]]) -> dict:
+    temps, clouds, precips = weather_lists
+
+    # Вторая по величине температура
+    sorted_temps = sorted(temps, reverse=True)
+    second_highest = sorted_temps[1] if len(sorted_temps) >= 2 else sorted_temps[0]
+    second_highest_temp = round(second_highest, 1)
+
+    hours = len(temps)
+    total_precip = sum(precips)
+    rainy_hours = sum(1 for p in precips if p >= PRECIP_MIN)
+    strong_hours = sum(1 for p in precips if p >= STRONG_RAIN)
+    clear_hours = sum(1 for c in clouds if c <= CLEAR_CLOUD_MAX)
+    avg_cloud = sum(clouds) / hours if hours else 0
+
+    # Классификация
+    if strong_hours >= STRONG_HOURS_MIN or total_precip >= HEAVY_TOTAL_PRECIP:
+        label = LABEL_HEAVY_PRECIPITATION
+    elif rainy_hours >= 1:
+        if clear_hours > hours / 2:
+            label = LABEL_CLEAR_SHORT_RAIN
         else:
-            if avg_cloud <= 50:
-                label = "Ясно или малооблачно"
-            elif avg_cloud <= 80:
-                label = "Облачно с прояснениями"
-            else:
-                label = "Пасмурно без осадков"
+            label = LABEL_PRECIPITATION
+    else:
+        if avg_cloud <= CLEAR_CLOUD_MAX:
+            label = LABEL_CLEAR
+        elif avg_cloud <= PARTLY_CLOUDY_MAX:
+            label = LABEL_PARTLY_CLOUDY
+        else:
+            label = LABEL_CLOUDY
+
+    return {"temp": second_highest_temp, "weather_label": label}
+
+def _now() -> datetime:
+    # рабочий день и задачи предзагрузки считаются в TIMEZONE, а не в часовом поясе сервера
+    return datetime.now(_tz)
+
+def _fetched_at(entry: WeatherCache) -> datetime:
+    # SQLite хранит время без пояса — это местное время TIMEZONE
+    fetched_at = entry.fetched_at
+    return fetched_at if fetched_at.tzinfo else _tz.localize(fetched_at)
 
-        return {"temp": second_highest_temp, "weather_label": label}
+def _is_final(entry: WeatherCache) -> bool:
+    # Данные, полученные после окончания рабочего дня, покрывают все рабочие часы и уже не изменятся
+    day_end = _tz.localize(datetime.strptime(entry.date, "%d.%m.%Y").replace(hour=WORK_END_HOUR))
+    return _fetched_at(entry) >= day_end
 
-    logger.info(f"[get_weather] Запрос погоды на {date_str}")
-    weather = None
+def _is_fresh(entry: WeatherCache) -> bool:
+    if _is_final(entry):
+        return True
+    return _now() - _fetched_at(entry) < timedelta(minutes=WEATHER_TODAY_TTL_MINUTES)
+
+def resolve_location(location: str | None) -> str:
+    """
+    Возвращает ключ точки продаж из config.LOCATIONS; неизвестные и пустые значения — точка по умолчанию.
+    """
+    if location in LOCATIONS:
+        return location
+    if location:
+        logger.warning(f"[resolve_location] Неизвестная точка продаж '{location}', использую '{DEFAULT_LOCATION}'")
+    return DEFAULT_LOCATION
+
+async def active_locations() -> List[str]:
+    """
+    Точки продаж, к которым привязан хотя бы один пользователь, и точка по умолчанию.
+    """
+    async with AsyncSessionLocal() as session:
+        rows = await session.execute(select(User.location).distinct())
+    locations = {resolve_location(location) for (location,) in rows}
+    locations.add(DEFAULT_LOCATION)
+    return sorted(locations)
+
+async def _read_cache(date_str: str, location: str, final_only: bool = False) -> dict | None:
+    latitude, longitude = LOCATIONS[location]
+    try:
+        async with AsyncSessionLocal() as session:
+            entry = await session.get(WeatherCache, (date_str, latitude, longitude))
+            if entry and (_is_final(entry) if final_only else _is_fresh(entry)):
+                return {"temp": entry.temp, "weather_label": entry.weather_label}
+    except Exception as e:
+        logger.error(f"[get_weather._read_cache] Ошибка при чтении кэша погоды за {date_str} ({location}): {e}")
+    return None
+
+async def _write_cache(date_str: str, weather: Dict[str, dict]) -> None:
+    # погода всех точек одного запроса к Open-Meteo пишется одной транзакцией
+    try:
+        async with AsyncSessionLocal.begin() as session:
+            for location, values in weather.items():
+                latitude, longitude = LOCATIONS[location]
+                await session.merge(WeatherCache(
+                    date=date_str,
+                    latitude=latitude,
+                    longitude=longitude,
+                    temp=values["temp"],
+                    weather_label=values["weather_label"],
+                    fetched_at=_now()
+                ))
+    except Exception as e:
+        logger.error(f"[get_weather._write_cache] Ошибка при записи кэша погоды за {date_str} "
+                     f"({', '.join(weather)}): {e}")
+
+async def _fetch_weather(date_str: str, locations: List[str]) -> Dict[str, dict]:
+    """
+    Запрашивает погоду сразу для нескольких точек одним запросом к Open-Meteo (координаты через запятую)
+    и кладёт результат в кэш. Точки, для которых погоду получить не удалось, в результат не попадают.
+    """
     formatted_date = datetime.strptime(date_str, "%d.%m.%Y").strftime("%Y-%m-%d")
+    params = {
+        'latitude': ",".join(str(LOCATIONS[location][0]) for location in locations),
+        'longitude': ",".join(str(LOCATIONS[location][1]) for location in locations),
+        'hourly': 'temperature_2m,precipitation,cloudcover',
+        'timezone': 'auto',
+        'start_date': formatted_date,
+        'end_date': formatted_date
+    }
+    logger.debug(f"Params: {params}")
 
-    weather_data = _weather_request()
-    if weather_data:
+    try:
+        async with _get_session().get(OPENMETEO_URL, params=params) as res:
+            data = await res.json()
+    except Exception as e:
+        logger.error(f"[get_weather._fetch_weather] Ошибка при запросе в Open-Meteo за {date_str} - {e}")
+        return {}
+
+    # для одной точки Open-Meteo возвращает объект, для нескольких — список объектов в том же порядке
+    items = data if isinstance(data, list) else [data]
+    if len(items) != len(locations):
+        logger.error(f"[get_weather._fetch_weather] Open-Meteo вернул {len(items)} ответов "
+                     f"для {len(locations)} точек за {date_str}: {data}")
+        return {}
+
+    result = {}
+    for location, item in zip(locations, items):
+        weather_data = _filter_work_hours(item)
         try:
             weather = _analyze_weather(weather_data)
         except Exception as e:
             logger.error(f"[get_weather] Ошибка при попытке анализа погодных данных "
-                         f"за {date_str}: {weather_data} - {e}")
-    return weather
+                         f"за {date_str} ({location}): {weather_data} - {e}")
+            continue
+        result[location] = weather
+    if result:
+        await _write_cache(date_str, result)
+    return result
+
+async def _load_weather(date_str: str, locations: List[str], refresh: bool = False) -> Dict[str, dict | None]:
+    results: Dict[str, dict | None] = {}
+    for location in locations:
+        cached = await _read_cache(date_str, location, final_only=refresh)
+        if cached:
+            results[location] = cached
+
+    # от проверки _inflight до регистрации нового запроса нет await — две задачи не запросят одну точку дважды
+    pending: Dict[str, asyncio.Task] = {}
+    to_fetch = []
+    for location in locations:
+        if location in results:
+            continue
+        if (date_str, location) in _inflight:
+            pending[location] = _inflight[(date_str, location)]
+        else:
+            to_fetch.append(location)
+
+    if to_fetch:
+        logger.info(f"[get_weather] Запрос погоды на {date_str} для точек: {', '.join(to_fetch)}")
+        task = asyncio.create_task(_fetch_weather(date_str, to_fetch))
+        keys = [(date_str, location) for location in to_fetch]
+        for key in keys:
+            _inflight[key] = task
+        task.add_done_callback(lambda done: [_inflight.pop(key) for key in keys if _inflight.get(key) is done])
+        for location in to_fetch:
+            pending[location] = task
+
+    for location, task in pending.items():
+        results[location] = (await asyncio.shield(task)).get(location)
+    return results
+
+async def get_cached_weather(date_str: str, location: str | None = None) -> dict | None:
+    return await _read_cache(date_str, resolve_location(location))
+
+async def get_weather(date_str: str, location: str | None = None, refresh: bool = False) -> dict | None:
+    """
+    Возвращает температуру и погодные условия за рабочий день date_str (ДД.ММ.ГГГГ) на точке продаж location.
+    Сначала смотрит в кэш 'weather_cache'. При промахе одним запросом к Open-Meteo загружает погоду сразу для всех
+    активных точек, которых нет в кэше; одновременные запросы за одну дату и точку объединяются.
+    refresh=True игнорирует неокончательные данные в кэше (полученные до конца рабочего дня).
+    """
+    location = resolve_location(location)
+    weather = await _read_cache(date_str, location, final_only=refresh)
+    if weather:
+        logger.info(f"[get_weather] Погода на {date_str} ({location}) взята из кэша")
+        return weather
+
+    locations = [location] + [other for other in await active_locations() if other != location]
+    results = await _load_weather(date_str, locations, refresh=refresh)
+    return results.get(location)
+
+async def _prefetch_weather(dates: List[str]) -> None:
+    locations = await active_locations()
+    for date_str in dates:
+        results = await _load_weather(date_str, locations, refresh=True)
+        for location, weather in results.items():
+            if weather:
+                logger.info(f"[_prefetch_weather] Погода на {date_str} ({location}) загружена заранее: {weather}")
+            else:
+                logger.warning(f"[_prefetch_weather] Не удалось заранее загрузить погоду на {date_str} ({location})")
+
+async def prefetch_today_weather_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Ежедневная задача: после окончания смены загружает окончательную погоду за сегодня.
+    """
+    await _prefetch_weather([_now().strftime("%d.%m.%Y")])
+
+async def prefetch_startup_weather_job(context: ContextTypes.DEFAULT_TYPE):
+    """
+    Задача при запуске бота: загружает погоду за вчера (и за сегодня, если смена уже закончилась).
+    """
+    now = _now()
+    dates = [(now - timedelta(days=1)).strftime("%d.%m.%Y")]
+    if now.hour >= WORK_END_HOUR:
+        dates.append(now.strftime("%d.%m.%Y"))
+    await _prefetch_weather(dates)
 
 async def daily_report_weather(user: User, chat_id: int, context: ContextTypes.DEFAULT_TYPE):
-    user.set_state("daily_report.weather")
-    text = "<b>📋 Отчёт по смене</b>\n\n⏳ Подожди, загружаю данные о погоде..."
-    await BotMessage(user=user,chat_id=chat_id, text=text, reply_markup=False).edit(context)
+    await user.set_state("daily_report.weather")
+    date = user.draft.date
+    location = user.draft.location or user.location
 
-    date = user.daily_report_draft["date"]
-    weather = _get_weather(date)
+    weather = await get_cached_weather(date, location)
+    if weather is None:
+        text = "<b>📋 Отчёт по смене</b>\n\n⏳ Подожди, загружаю данные о погоде..."
+        weather = await BotMessage(user=user,chat_id=chat_id, text=text, reply_markup=False).edit_while(
+            context, get_weather(date, location))
 
     if weather:
         temp, weather_label = weather["temp"], weather["weather_label"]
         comment = f"{date}:\n🌡 <b>Температура:</b> {temp}°C\n🌤️ <b>Погодные условия:</b> {weather_label}\n\n"
-        user.write_to_draft(temp=temp, weather_label=weather_label)
+        await user.write_to_draft(temp=temp, weather_label=weather_label)
     else:
-        user.set_state("daily_report.manual_temp")
+        await user.set_state("daily_report.manual_temp")
         comment = f"Не удалось загрузить данные о погоде 😕\n"
 
     await BotMessage(user, chat_id, comment=comment).edit(context)
@@ -0,0 +1,156 @@
+import logging
+import utils.logger # noqa: F401
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import aiohttp
+import numpy as np
+
+from config import LOCATIONS, DEFAULT_LOCATION, OPENMETEO_HISTORICAL_URL, OPENMETEO_HISTORICAL_TIMEOUT, \
+    WORK_START_HOUR, WORK_END_HOUR, DAILY_REPORT_SHEET_ID
+from utils.executor import run_io
+from utils.google_sheets import get_worksheet
+from utils.models.base import SessionLocal
+from utils.models.weather_cache import WeatherCache
+from utils.sheets_quota import sheets_call, Priority
+from utils.weather import _get_session, _now, PRECIP_MIN, STRONG_RAIN, STRONG_HOURS_MIN, HEAVY_TOTAL_PRECIP, \
+    CLEAR_CLOUD_MAX, PARTLY_CLOUDY_MAX, LABEL_HEAVY_PRECIPITATION, LABEL_CLEAR_SHORT_RAIN, LABEL_PRECIPITATION, \
+    LABEL_CLEAR, LABEL_PARTLY_CLOUDY, LABEL_CLOUDY
+
+logger = logging.getLogger(__name__)
+
+
+def _to_days_matrix(hourly: dict) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Раскладывает почасовой ответ Open-Meteo в матрицы дни × рабочие часы.
+    Возвращает даты (ДД.ММ.ГГГГ) и матрицы температур, облачности и осадков (пропуски — NaN).
+    """
+    times = hourly.get("time", [])
+    if len(times) % 24 or any(int(t[11:13]) != i % 24 for i, t in enumerate(times)):
+        raise ValueError("в ответе Open-Meteo не по 24 часа на каждый день")
+    days = len(times) // 24
+    dates = [datetime.strptime(times[d * 24][:10], "%Y-%m-%d").strftime("%d.%m.%Y") for d in range(days)]
+
+    def _matrix(name: str) -> np.ndarray:
+        values = np.array([np.nan if v is None else v for v in hourly.get(name, [])], dtype=float)
+        return values.reshape(days, 24)[:, WORK_START_HOUR:WORK_END_HOUR]
+
+    return dates, _matrix("temperature_2m"), _matrix("cloudcover"), _matrix("precipitation")
+
+
+def analyze_weather_bulk(temps: np.ndarray, clouds: np.ndarray, precips: np.ndarray) -> List[dict | None]:
+    """
+    Векторный аналог utils.weather._analyze_weather для матриц дни × часы.
+    Дни с пропущенными значениями возвращаются как None.
+    """
+    hours = temps.shape[1]
+    sorted_temps = np.sort(temps, axis=1)
+    second_highest = sorted_temps[:, -2] if hours >= 2 else sorted_temps[:, -1]
+
+    # cumsum складывает слева направо, как встроенный sum() — пороги срабатывают так же, как в скалярной версии
+    total_precip = np.cumsum(precips, axis=1)[:, -1]
+    rainy_hours = (precips >= PRECIP_MIN).sum(axis=1)
+    strong_hours = (precips >= STRONG_RAIN).sum(axis=1)
+    clear_hours = (clouds <= CLEAR_CLOUD_MAX).sum(axis=1)
+    avg_cloud = np.cumsum(clouds, axis=1)[:, -1] / hours
+
+    labels = np.select(
+        [
+            (strong_hours >= STRONG_HOURS_MIN) | (total_precip >= HEAVY_TOTAL_PRECIP),
+            (rainy_hours >= 1) & (clear_hours > hours / 2),
+            rainy_hours >= 1,
+            avg_cloud <= CLEAR_CLOUD_MAX,
+            avg_cloud <= PARTLY_CLOUDY_MAX,
+        ],
+        [LABEL_HEAVY_PRECIPITATION, LABEL_CLEAR_SHORT_RAIN, LABEL_PRECIPITATION, LABEL_CLEAR, LABEL_PARTLY_CLOUDY],
+        default=LABEL_CLOUDY,
+    )
+    complete = ~(np.isnan(temps).any(axis=1) | np.isnan(clouds).any(axis=1) | np.isnan(precips).any(axis=1))
+
+    return [
+        {"temp": round(float(temp), 1), "weather_label": str(label)} if ok else None
+        for temp, label, ok in zip(second_highest, labels, complete)
+    ]
+
+
+async def _fetch_weather_range(start_date: str, end_date: str,
+                               locations: List[str]) -> Dict[Tuple[str, str], dict]:
+    """
+    Одним запросом к Open-Meteo получает погоду за период для всех точек.
+    Возвращает словарь (дата, точка продаж) → погода.
+    """
+    params = {
+        'latitude': ",".join(str(LOCATIONS[location][0]) for location in locations),
+        'longitude': ",".join(str(LOCATIONS[location][1]) for location in locations),
+        'hourly': 'temperature_2m,precipitation,cloudcover',
+        'timezone': 'auto',
+        'start_date': datetime.strptime(start_date, "%d.%m.%Y").strftime("%Y-%m-%d"),
+        'end_date': datetime.strptime(end_date, "%d.%m.%Y").strftime("%Y-%m-%d")
+    }
+    async with _get_session().get(OPENMETEO_HISTORICAL_URL, params=params,
+                                  timeout=aiohttp.ClientTimeout(total=OPENMETEO_HISTORICAL_TIMEOUT)) as res:
+        data = await res.json()
+    items = data if isinstance(data, list) else [data]
+    if len(items) != len(locations) or any("hourly" not in item for item in items):
+        raise ValueError(f"Open-Meteo вернул неожиданный ответ: {data}")
+
+    result = {}
+    for location, item in zip(locations, items):
+        dates, temps, clouds, precips = _to_days_matrix(item["hourly"])
+        for date, weather in zip(dates, analyze_weather_bulk(temps, clouds, precips)):
+            if weather:
+                result[(date, location)] = weather
+    return result
+
+
+def _write_weather_to_reports(weather: Dict[Tuple[str, str], dict]) -> int:
+    """
+    Записывает температуру (F) и погодные условия (G) во все строки листа 'reports' с найденными (датой, точкой)
+    одним пакетным обновлением. Возвращает количество обновлённых строк.
+    """
+    worksheet = get_worksheet(DAILY_REPORT_SHEET_ID, "reports")
+    dates_column, locations_column = sheets_call(Priority.BULK, worksheet.batch_get, ["A:A", "I:I"])
+    data = []
+    for row_number in range(2, len(dates_column) + 1):
+        date = dates_column[row_number - 1][0].strip() if dates_column[row_number - 1] else ""
+        location_cell = locations_column[row_number - 1] if row_number <= len(locations_column) else []
+        location = (location_cell[0].strip() if location_cell else "") or DEFAULT_LOCATION
+        row_weather = weather.get((date, location))
+        if row_weather:
+            data.append({
+                "range": f"F{row_number}:G{row_number}",
+                "values": [[row_weather["temp"], row_weather["weather_label"]]]
+            })
+    if data:
+        sheets_call(Priority.BULK, worksheet.batch_update, data)
+    return len(data)
+
+
+def _write_weather_to_cache(weather: Dict[Tuple[str, str], dict]) -> None:
+    fetched_at = _now()
+    with SessionLocal.begin() as session:
+        for (date, location), day_weather in weather.items():
+            latitude, longitude = LOCATIONS[location]
+            session.merge(WeatherCache(
+                date=date,
+                latitude=latitude,
+                longitude=longitude,
+                temp=day_weather["temp"],
+                weather_label=day_weather["weather_label"],
+                fetched_at=fetched_at
+            ))
+
+
+async def backfill_weather(start_date: str, end_date: str) -> Tuple[int, int]:
+    """
+    Заполняет погоду в листе 'reports' за период start_date..end_date (ДД.ММ.ГГГГ) для всех точек продаж
+    одним запросом к Open-Meteo и одним пакетным обновлением таблицы.
+    Возвращает (дней × точек с данными о погоде, обновлённых строк).
+    """
+    logger.info(f"[backfill_weather] Заполнение погоды за период {start_date} — {end_date}")
+    weather = await _fetch_weather_range(start_date, end_date, list(LOCATIONS))
+    await run_io("db", _write_weather_to_cache, weather)
+    updated_rows = await run_io("google_bulk", _write_weather_to_reports, weather)
+    logger.info(f"[backfill_weather] Получена погода для {len(weather)} пар (дата, точка), "
+                f"обновлено строк в листе 'reports': {updated_rows}")
+    return len(weather), updated_rows
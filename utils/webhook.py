@@ -0,0 +1,82 @@
+import asyncio
+import hmac
+import logging
+import signal
+import utils.logger # noqa: F401
+from typing import Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from config import WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, \
+    WEBHOOK_HEALTH_PATH
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def build_webhook_app(application: Application, secret_token: Optional[str],
+                      path: str = WEBHOOK_PATH, health_path: str = WEBHOOK_HEALTH_PATH) -> web.Application:
+    """
+    HTTP-приложение webhook: POST path — обновление от Telegram (проверяется секрет из заголовка
+    X-Telegram-Bot-Api-Secret-Token), GET health_path — состояние бота для балансировщика.
+    Обновление только кладётся в application.update_queue и обрабатывается теми же обработчиками, что и при опросе,
+    поэтому Telegram получает ответ сразу.
+    """
+    async def handle_update(request: web.Request) -> web.Response:
+        received = request.headers.get(SECRET_TOKEN_HEADER, "")
+        if secret_token and not hmac.compare_digest(received, secret_token):
+            logger.warning(f"[webhook] Отклонён запрос с неверным секретом от {request.remote}")
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logger.warning(f"[webhook] Не удалось разобрать обновление от {request.remote}: {e}")
+            return web.Response(status=400)
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def health(request: web.Request) -> web.Response:
+        status = 200 if application.running else 503
+        return web.json_response({"running": application.running, "pending_updates": application.update_queue.qsize()},
+                                 status=status)
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get(health_path, health)
+    return app
+
+
+async def run_webhook(application: Application) -> None:
+    """
+    Запускает бота в режиме webhook на встроенном сервере aiohttp (WEBHOOK_LISTEN:WEBHOOK_PORT) и регистрирует
+    WEBHOOK_URL + WEBHOOK_PATH в Telegram. Работает до SIGINT/SIGTERM, затем останавливается так же, как run_polling,
+    включая post_init/post_shutdown.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    runner = web.AppRunner(build_webhook_app(application, WEBHOOK_SECRET_TOKEN), access_log=None)
+    try:
+        await application.bot.set_webhook(url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                                          secret_token=WEBHOOK_SECRET_TOKEN, allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        await runner.setup()
+        await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+        logger.info(f"[run_webhook] Сервер webhook слушает {WEBHOOK_LISTEN}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        await stop.wait()
+    finally:
+        logger.info("[run_webhook] Останавливаю сервер webhook...")
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)